@@ -0,0 +1,12 @@
+'''
+Decision trees over dictionary-encoded categorical data.
+
+Importing the package runs nothing and does not import pandas; the modules
+are listed in the README and the commands live in ``decision_tree.cli``.
+'''
+
+from .builder import build_tree
+from .cache import load_cached
+from .compiled import compile_tree, predict_batch, decode_labels
+from .dataset import load_config, load_csv_to_header_data, project_columns, compute_stats
+from .model import save_model, load_model
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+
+'''
+Training scalability benchmark on synthetic data.
+
+``write_synthetic`` writes a CSV shaped like the dataset a config describes:
+the same attribute names, target and value tables by default, with more
+attributes (``att<i>``) or a fixed number of values per attribute
+(``v<j>``) on request.  Values are drawn with skewed per-column frequencies
+and the label is a fixed random function of a few attributes with some
+noise, so trees grow the way they do on real data instead of staying stumps.
+
+``run_benchmark`` times each stage on its own for every point of a
+(rows x attributes x cardinality) grid:
+
+    load       load_csv_to_header_data on the training CSV
+    stats      compute_stats, the single pass that replaced get_uniq_values
+    build      build_tree with the entropy criterion
+    compile    compile_tree
+    evaluate   accuracy on a held-out synthetic CSV, already encoded
+
+and appends one JSON line per run to the output file, with the parameters,
+the timings in seconds, the size of the tree, the accuracy, the peak RSS and
+the git commit, for tracking regressions across changes.  Every run has a
+fresh process of its own, so its peak RSS is not that of an earlier, larger
+run; with ``workers`` it does not include the worker processes.
+'''
+
+import argparse
+import concurrent.futures
+import csv
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from .builder import build_tree
+from .compiled import compile_tree
+from .dataset import load_config, load_csv_to_header_data, project_columns, compute_stats
+from .evaluate import accuracy
+from .structure import tree_stats
+
+GENERATE_CHUNK_ROWS = 1 << 18
+INFORMATIVE_ATTS = 3
+LABEL_NOISE = 0.05
+LABEL_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def load_schema(config_file):
+    # attribute names and value tables of the dataset a config describes
+    config = load_config(config_file)
+    data = load_csv_to_header_data(config['data_file'], config['data_project_columns'])
+    data = project_columns(data, config['data_project_columns'])
+    target_attribute = config['target_attribute']
+    return {
+        'attributes': [(att, list(data['values'][data['name_to_idx'][att]]))
+                       for att in data['header'] if att != target_attribute],
+        'target_attribute': target_attribute,
+        'labels': list(data['values'][data['name_to_idx'][target_attribute]])
+    }
+
+
+def synthetic_schema(schema, n_atts=None, cardinality=None):
+    attributes = list(schema['attributes'])
+    n_atts = len(attributes) if n_atts is None else n_atts
+    attributes = attributes[:n_atts]
+    for i in range(len(attributes), n_atts):
+        attributes.append(('att{}'.format(i), attributes[i % len(schema['attributes'])][1]))
+    if cardinality is not None:
+        attributes = [(att, (values + ['v{}'.format(j) for j in range(len(values), cardinality)])
+                       [:cardinality]) for att, values in attributes]
+    return dict(schema, attributes=attributes)
+
+
+def write_synthetic(filename, schema, n_rows, seed=0, part=0):
+    # ``seed`` fixes the distribution, ``part`` the sample drawn from it, so
+    # a training and a test file of one seed follow the same rules
+    model_rng = np.random.default_rng(seed)
+    rng = np.random.default_rng([seed, part])
+    attributes = schema['attributes']
+    labels = np.array(schema['labels'], dtype=object)
+
+    # skewed value frequencies, and the label a random function of a few attributes
+    probs = [model_rng.dirichlet(np.full(len(values), 0.7)) for _, values in attributes]
+    informative = model_rng.choice(len(attributes), size=min(INFORMATIVE_ATTS, len(attributes)),
+                                   replace=False)
+    # a random 64-bit code per value of each informative attribute; the XOR
+    # of a row's codes, mixed, picks its label, without a table over the
+    # product of their cardinalities
+    value_keys = [model_rng.integers(1 << 63, size=len(attributes[i][1]), dtype=np.uint64)
+                  for i in informative]
+    tables = [np.array(values, dtype=object) for _, values in attributes]
+
+    tmp = filename + '.tmp'
+    with open(tmp, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([att for att, _ in attributes] + [schema['target_attribute']])
+        for start in range(0, n_rows, GENERATE_CHUNK_ROWS):
+            n = min(GENERATE_CHUNK_ROWS, n_rows - start)
+            codes = [rng.choice(len(p), size=n, p=p) for p in probs]
+            key = np.zeros(n, dtype=np.uint64)
+            for i, keys in zip(informative, value_keys):
+                key ^= keys[codes[i]]
+            key *= LABEL_MIX
+            y = ((key >> np.uint64(32)) % np.uint64(len(labels))).astype(np.int64)
+            noisy = rng.random(n) < LABEL_NOISE
+            y[noisy] = rng.integers(len(labels), size=int(noisy.sum()))
+            columns = [table[c] for table, c in zip(tables, codes)] + [labels[y]]
+            writer.writerows(zip(*columns))
+    os.replace(tmp, filename)
+
+
+def schema_digest(schema):
+    # short hash of everything besides the rows and seed that shapes a file
+    spec = [schema['attributes'], schema['target_attribute'], schema['labels'],
+            INFORMATIVE_ATTS, LABEL_NOISE, int(LABEL_MIX), GENERATE_CHUNK_ROWS]
+    return hashlib.sha1(json.dumps(spec).encode()).hexdigest()[:10]
+
+
+def synthetic_file(work_dir, schema, n_rows, seed, part):
+    name = 'synth_r{}_a{}_c{}_s{}_{}_{}.csv'.format(
+        n_rows, len(schema['attributes']),
+        max(len(values) for _, values in schema['attributes']), seed, schema_digest(schema),
+        part)
+    filename = os.path.join(work_dir, name)
+    if not os.path.exists(filename):
+        write_synthetic(filename, schema, n_rows, seed, part)
+    return filename
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                             text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def peak_rss_mb():
+    # Linux keeps ru_maxrss across fork and exec, so a fresh process would
+    # report its parent's size; VmHWM only covers the process's own memory
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / (1 << 10)
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+
+def run_once(train_file, test_file, target_attribute, workers=None):
+    timings = {}
+
+    start = time.perf_counter()
+    data = load_csv_to_header_data(train_file)
+    timings['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    uniqs = compute_stats(data, target_attribute)['values']
+    timings['stats'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    remaining_atts = set(data['header']) - {target_attribute}
+    root = build_tree(data, uniqs, remaining_atts, target_attribute, 'entropy', workers=workers)
+    timings['build'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tree = compile_tree(root, data, target_attribute)
+    timings['compile'] = time.perf_counter() - start
+
+    test = load_csv_to_header_data(test_file)
+    start = time.perf_counter()
+    test_accuracy = accuracy(tree, test)
+    timings['evaluate'] = time.perf_counter() - start
+
+    stats = tree_stats(root)
+    return {
+        'timings': timings,
+        'tree': {'depth': stats['depth'], 'nodes': stats['nodes'], 'leaves': stats['leaves']},
+        'accuracy': test_accuracy
+    }
+
+
+def _measured_run(train_file, test_file, target_attribute, workers):
+    result = run_once(train_file, test_file, target_attribute, workers)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def run_isolated(train_file, test_file, target_attribute, workers=None):
+    # run_once in a new interpreter, whose peak RSS is this run's alone
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_measured_run, train_file, test_file, target_attribute,
+                               workers).result()
+
+
+def run_benchmark(config_file, rows, atts=(None,), cardinalities=(None,), out=None,
+                  work_dir='bench_data', test_rows=100000, repeat=1, workers=None, seed=0):
+    os.makedirs(work_dir, exist_ok=True)
+    base = load_schema(config_file)
+    commit = git_commit()
+    results = []
+    for n_rows in rows:
+        for n_atts in atts:
+            for cardinality in cardinalities:
+                schema = synthetic_schema(base, n_atts, cardinality)
+                train_file = synthetic_file(work_dir, schema, n_rows, seed, 0)
+                test_file = synthetic_file(work_dir, schema, min(n_rows, test_rows), seed, 1)
+                for run in range(repeat):
+                    result = {
+                        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+                        'commit': commit,
+                        'python': platform.python_version(),
+                        'numpy': np.__version__,
+                        'rows': n_rows,
+                        'attributes': len(schema['attributes']),
+                        'cardinality': max(len(values) for _, values in schema['attributes']),
+                        'workers': workers,
+                        'seed': seed,
+                        'run': run
+                    }
+                    result.update(run_isolated(train_file, test_file,
+                                               schema['target_attribute'], workers))
+                    results.append(result)
+                    if out is not None:
+                        out.write(json.dumps(result) + '\n')
+                        out.flush()
+    return results
+
+
+def _count(text):
+    # accepts 1000, 1e3 and 1_000
+    return int(float(text))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark training on synthetic data.')
+    parser.add_argument('--config', default='data/data.cfg',
+                        help='config of the dataset whose schema is copied (default %(default)s)')
+    parser.add_argument('--rows', type=_count, nargs='+', default=[1000, 10000, 100000],
+                        help='training rows, e.g. 1e3 1e5 1e7 (default %(default)s)')
+    parser.add_argument('--atts', type=int, nargs='+', default=[None],
+                        help='numbers of attributes (default: as in the schema)')
+    parser.add_argument('--cardinality', type=int, nargs='+', default=[None],
+                        help='values per attribute (default: as in the schema)')
+    parser.add_argument('--test-rows', type=_count, default=100000,
+                        help='most rows of the held-out file (default %(default)s)')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--work-dir', default='bench_data',
+                        help='where generated CSVs are kept between runs (default %(default)s)')
+    parser.add_argument('--out', default='bench_results.jsonl',
+                        help="JSON lines file the results are appended to, '-' for stdout")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.out == '-' else open(args.out, 'a')
+    try:
+        run_benchmark(args.config, args.rows, args.atts, args.cardinality, out, args.work_dir,
+                      args.test_rows, args.repeat, args.workers, args.seed)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
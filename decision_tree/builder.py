@@ -0,0 +1,448 @@
+#!/usr/bin/env python
+
+'''
+Tree builder shared by the decision tree scripts.
+
+The builder keeps a single permutation of the dataset's row indices.  Every
+node owns the contiguous slice ``perm[start:end]`` and a split reorders that
+slice in place so each child again owns a contiguous sub-slice.  No row list
+is copied and no partition outlives the split that produced it.
+
+The tree is returned as the usual nested dict:
+
+{'attribute': NAME, 'entropy': IMPURITY, 'nodes': {VALUE: SUBTREE, ...}}
+{'label': LABEL}
+
+Splits are scored by ``criterion``, the name of one of the criteria in
+criteria.py ('entropy', 'gini', 'misclassification') or a Criterion object.
+With ``node_info='Info-Gain'`` internal nodes record the gain of their split
+instead of their impurity.
+
+With ``max_features`` set, each node scores only that many of its candidate
+attributes, drawn at random from ``seed`` and the node's slice, as the
+members of a random forest do (see forest.py).
+
+Growth runs from an explicit stack, not by recursion, so the depth of a
+tree is not bounded by Python's recursion limit.  A stack entry is the node
+to fill in, its slice, the bit mask of the candidate attributes left to it
+(bit i for the i-th candidate in header order), its depth, its histogram and
+its class counts.
+
+Numeric attributes binned by numeric.py split in two at the best bin edge,
+scored from the cumulative counts of their bins; their children are keyed
+``numeric.LEFT`` and ``numeric.RIGHT`` and the node records its
+``'threshold'``.  They stay in the candidate mask of their children.
+
+Every node carries the histogram of its rows: the (value x class) counts of
+all candidate attributes stacked into one array.  When a node splits, the
+children that will split in turn need theirs.  The largest child's
+histogram is the parent's minus its siblings', so that child is never
+scanned whenever scanning the siblings is the cheaper way to get it.  The
+root starts from the counts of ``compute_stats`` when they are attached.
+
+Growth stops at pure nodes, at nodes with no attribute left, at nodes
+``depth`` splits below the root, at nodes with fewer than
+``min_samples_split`` rows and at nodes whose best gain is below
+``min_gain``; each of them becomes a majority label leaf.  Nodes are grown
+depth first unless ``max_leaves`` is set: then candidate nodes wait in a
+priority queue and the one with the highest gain is split first, as long as
+its children keep the tree within ``max_leaves`` leaves.  Candidates left
+over become majority label leaves.
+
+With ``workers`` set, the codes and the permutation move to shared memory
+and a process pool (see parallel.py) takes two kinds of work: counting the
+candidate attributes of large nodes, and growing large subtrees.  A subtree
+sent to a worker only reorders its own slice of the permutation and comes
+back as a flat node list (see structure.py), so its depth is not bounded by
+the pickler's recursion either; its slot in the parent's ``nodes`` is
+filled in once the whole tree has been walked, so the result is the same
+tree the serial build produces.  Best first growth only uses the pool for
+counting.
+
+With a ``recorder`` (see instrument.py) every node reports its wall time,
+rows scanned, candidate attributes scored and child slices; subtrees grown
+by workers send their records back with the subtree.
+'''
+
+import heapq
+import itertools
+
+import numpy as np
+
+from .criteria import get_criterion
+from .instrument import MemorySink, Recorder
+from .numeric import LEFT, RIGHT
+from .parallel import SharedPool, worker_arrays
+from .scoring import count_hist
+from .structure import flatten_tree, unflatten_tree
+
+# gains within this of the best are ties, won by the attribute that comes
+# first in the header whatever rounding the criterion's arithmetic produced
+GAIN_TOLERANCE = 1e-12
+
+
+def partition_in_place(perm, start, end, col, value_counts, cut=None):
+    # by value code, or by side of the bin ``cut`` for a threshold split
+    rows = perm[start:end]
+    keys = col[rows] if cut is None else col[rows] > cut
+    order = np.argsort(keys, kind='stable')
+    perm[start:end] = rows[order]
+    bounds = np.empty(len(value_counts) + 1, dtype=np.intp)
+    bounds[0] = start
+    np.cumsum(value_counts, out=bounds[1:])
+    bounds[1:] += start
+    return bounds
+
+
+def new_context(data, uniqs, atts, target_attribute, criterion, node_info,
+                min_samples_split=None, min_gain=None, max_features=None, seed=0, depth=None):
+    # everything grow() needs besides the arrays, small enough to send to workers
+    name_to_idx = data['name_to_idx']
+    target_idx = name_to_idx[target_attribute]
+    hist_idxs = [name_to_idx[att] for att in atts]
+    hist_sizes = [len(data['values'][idx]) for idx in hist_idxs]
+    hist_starts = np.zeros(len(atts) + 1, dtype=np.intp)
+    np.cumsum(hist_sizes, out=hist_starts[1:])
+    bins = data.get('bins', {})
+    return {
+        'name_to_idx': name_to_idx,
+        'values': data['values'],
+        'value_to_code': data['value_to_code'],
+        'uniqs': uniqs,
+        'target_idx': target_idx,
+        'n_classes': len(data['values'][target_idx]),
+        'criterion': criterion,
+        'node_info': node_info,
+        'max_depth': depth,
+        'min_samples_split': min_samples_split,
+        'min_gain': min_gain,
+        'max_features': max_features,
+        'seed': seed,
+        # layout of the node histograms: the tables of ``atts`` stacked
+        'hist_idxs': hist_idxs,
+        'hist_sizes': hist_sizes,
+        'hist_starts': hist_starts,
+        'hist_atts': list(atts),
+        'hist_pos': {att: i for i, att in enumerate(atts)},
+        # edges of the numeric candidates and their histogram positions
+        'bins': {att: bins[att] for att in atts if att in bins},
+        'numeric': {i for i, att in enumerate(atts) if att in bins}
+    }
+
+
+def count(ctx, counter, n):
+    if ctx['recorder'] is not None:
+        ctx['recorder'].add(counter, n)
+
+
+def mask_positions(mask):
+    # histogram positions of the candidate attributes set in ``mask``
+    positions = []
+    pos = 0
+    while mask:
+        if mask & 1:
+            positions.append(pos)
+        mask >>= 1
+        pos += 1
+    return positions
+
+
+def scan_hist(ctx, start, end):
+    count(ctx, 'rows_scanned', end - start)
+    pool = ctx['pool']
+    args = (ctx['hist_idxs'], ctx['hist_sizes'], ctx['target_idx'], ctx['n_classes'])
+    if pool is not None and pool.worth_it(end - start, len(ctx['hist_idxs'])):
+        return np.concatenate(pool.count_tables(start, end, *args))
+    return count_hist(ctx['codes'], ctx['perm'][start:end], *args)
+
+
+def candidate_positions(ctx, start, end, mask):
+    # the attributes a node scores: all of ``mask``, or a random subset of
+    # ``max_features`` of them that depends only on the seed and the node
+    positions = mask_positions(mask)
+    max_features = ctx['max_features']
+    if max_features is None or len(positions) <= max_features:
+        return positions
+    rng = np.random.default_rng([ctx['seed'], start, end, len(positions)])
+    return sorted(rng.choice(positions, max_features, replace=False).tolist())
+
+
+def best_cut(criterion, ent, table, n_cuts):
+    # gain of the best threshold split of a numeric attribute's (bin x class)
+    # table and its last bin on the left, cuts with an empty side excluded;
+    # there is a cut after each of the first ``n_cuts`` bins, the bin of
+    # missing values staying on the right
+    left = np.cumsum(table, axis=0)[:n_cuts]
+    right = table.sum(axis=0) - left
+    valid = (left.sum(axis=1) > 0) & (right.sum(axis=1) > 0)
+    if not valid.any():
+        return -np.inf, None
+    pairs = np.stack([left, right], axis=1).reshape(-1, table.shape[1])
+    gains = ent - criterion.split_impurities(pairs, np.arange(0, len(pairs), 2))
+    gains[~valid] = -np.inf
+    cut = int(np.flatnonzero(gains >= gains.max() - GAIN_TOLERANCE)[0])
+    return gains[cut], cut
+
+
+def best_split(ctx, hist, class_counts, positions):
+    # (attribute, gain, impurity, class counts of every child, cut), the cut
+    # being None for a split by value; None when no candidate can split
+    criterion = ctx['criterion']
+    ent = criterion.node_impurity(class_counts)
+    starts = ctx['hist_starts']
+    gains = ent - criterion.split_impurities(hist, starts[:-1])
+    gains = gains[positions]
+    count(ctx, 'candidates', len(positions))
+    cuts = {}
+    if ctx['numeric']:
+        for i, pos in enumerate(positions):
+            if pos in ctx['numeric']:
+                edges = ctx['bins'][ctx['hist_atts'][pos]]
+                gains[i], cuts[pos] = best_cut(criterion, ent, hist[starts[pos]:starts[pos + 1]],
+                                               len(edges))
+        if gains.max() == -np.inf:
+            return None
+    best = int(np.flatnonzero(gains >= gains.max() - GAIN_TOLERANCE)[0])
+    pos = positions[best]
+    table = hist[starts[pos]:starts[pos + 1]]
+    cut = cuts.get(pos)
+    if cut is not None:
+        table = np.stack([table[:cut + 1].sum(axis=0), table[cut + 1:].sum(axis=0)])
+    return ctx['hist_atts'][pos], float(gains[best]), ent, table, cut
+
+
+def child_hists(ctx, hist, bounds, value_counts, wanted):
+    # histograms of the children in ``wanted``; the largest child is derived by
+    # subtracting its siblings from ``hist`` when scanning them is cheaper
+    present = np.flatnonzero(value_counts)
+    largest = int(present[np.argmax(value_counts[present])])
+    others = [int(code) for code in present if code != largest]
+    if largest in wanted and value_counts[others].sum() < value_counts[wanted].sum():
+        hists = {code: scan_hist(ctx, bounds[code], bounds[code + 1]) for code in others}
+        rest = hist.copy()
+        for sibling in hists.values():
+            rest -= sibling
+        hists[largest] = rest
+        return hists
+    return {code: scan_hist(ctx, bounds[code], bounds[code + 1]) for code in wanted}
+
+
+def can_split(ctx, n_rows, mask, depth, class_counts):
+    # the stopping rules that need no split to be scored
+    max_depth = ctx['max_depth']
+    if max_depth is not None and depth >= max_depth:
+        return False
+    if not mask or np.count_nonzero(class_counts) == 1:
+        return False
+    return ctx['min_samples_split'] is None or n_rows >= ctx['min_samples_split']
+
+
+def majority_label(ctx, class_counts):
+    return ctx['values'][ctx['target_idx']][int(np.argmax(class_counts))]
+
+
+def score_node(ctx, start, end, mask, depth, hist, class_counts):
+    # the node's best split, or None when the node is a leaf
+    if not can_split(ctx, end - start, mask, depth, class_counts):
+        return None
+    split = best_split(ctx, hist, class_counts, candidate_positions(ctx, start, end, mask))
+    if split is not None and ctx['min_gain'] is not None and split[1] < ctx['min_gain']:
+        return None
+    return split
+
+
+def child_keys(ctx, split):
+    # (key in the node's 'nodes', index in split_node's children), in key order
+    att, cut = split[0], split[4]
+    if cut is not None:
+        return [(LEFT, 0), (RIGHT, 1)]
+    value_to_code = ctx['value_to_code'][ctx['name_to_idx'][att]]
+    return [(att_value, value_to_code[att_value]) for att_value in ctx['uniqs'][att]]
+
+
+def fill_split(ctx, node, split):
+    # the fields of an internal node, its children left to the caller
+    att, info_gain, ent, _, cut = split
+    node['attribute'] = att
+    if cut is not None:
+        node['threshold'] = ctx['bins'][att][cut]
+    if ctx['node_info'] == 'Info-Gain':
+        node['Info-Gain'] = info_gain
+    else:
+        node['entropy'] = ent
+    node['nodes'] = {}
+
+
+def split_node(ctx, node, start, end, mask, depth, hist, split):
+    # fill in the internal node and partition its rows; returns, per value
+    # code or side of the cut, the arguments that grow the child: slice,
+    # attribute mask, depth, histogram and class counts
+    att, _, _, table, cut = split
+    fill_split(ctx, node, split)
+
+    att_idx = ctx['name_to_idx'][att]
+    value_counts = table.sum(axis=1)
+    bounds = partition_in_place(ctx['perm'], start, end, ctx['codes'][att_idx], value_counts,
+                                cut)
+    count(ctx, 'partitions', np.count_nonzero(value_counts))
+
+    sub_mask = mask if cut is not None else mask & ~(1 << ctx['hist_pos'][att])
+    sub_depth = depth + 1
+    wanted = [code for code in np.flatnonzero(value_counts)
+              if can_split(ctx, value_counts[code], sub_mask, sub_depth, table[code])]
+    hists = child_hists(ctx, hist, bounds, value_counts, wanted) if wanted else {}
+
+    return [(bounds[code], bounds[code + 1], sub_mask, sub_depth,
+             hists.pop(code, None), table[code])
+            for code in range(len(value_counts))]
+
+
+def grow(ctx, start, end, mask, depth, hist, class_counts):
+    # depth first from an explicit stack of (node, slice, attribute mask,
+    # depth, histogram, class counts), nodes being filled in place
+    pool = ctx['pool']
+    recorder = ctx['recorder']
+    root = {}
+    stack = [(root, start, end, mask, depth, hist, class_counts)]
+    while stack:
+        node, start, end, mask, depth, hist, class_counts = stack.pop()
+        token = recorder.start_node() if recorder is not None else None
+        majority = majority_label(ctx, class_counts)
+
+        split = score_node(ctx, start, end, mask, depth, hist, class_counts)
+        if split is None:
+            node['label'] = majority
+            if recorder is not None:
+                recorder.end_node(token, depth, end - start)
+            continue
+
+        children = split_node(ctx, node, start, end, mask, depth, hist, split)
+        del hist
+        if recorder is not None:
+            recorder.end_node(token, depth, end - start, split[0])
+
+        todo = []
+        for att_value, child_idx in child_keys(ctx, split):
+            args = children[child_idx]
+            sub_start, sub_end = args[:2]
+            if sub_end == sub_start:
+                node['nodes'][att_value] = {'label': majority}
+            elif pool is not None and pool.worth_sending(sub_end - sub_start):
+                # the slot keeps the serial key order, the worker fills it in later
+                node['nodes'][att_value] = None
+                future = pool.submit(_grow_task, *args)
+                ctx['pending'].append((node['nodes'], att_value, future))
+            else:
+                child = node['nodes'][att_value] = {}
+                todo.append((child,) + args)
+        # children are popped in value order, as the recursive builder visited them
+        stack.extend(reversed(todo))
+
+    return root
+
+
+def push_candidate(ctx, heap, order, node, start, end, mask, depth, hist, class_counts):
+    # queue the node by the gain of its best split, or make it a leaf
+    recorder = ctx['recorder']
+    token = recorder.start_node() if recorder is not None else None
+    majority = majority_label(ctx, class_counts)
+    split = score_node(ctx, start, end, mask, depth, hist, class_counts)
+    if split is None:
+        node['label'] = majority
+        if recorder is not None:
+            recorder.end_node(token, depth, end - start)
+        return
+    if recorder is not None:
+        token = recorder.pause_node(token)
+    candidate = (node, start, end, mask, depth, hist, split, majority, token)
+    heapq.heappush(heap, (-split[1], next(order), candidate))
+
+
+def grow_best_first(ctx, start, end, mask, depth, hist, class_counts, max_leaves):
+    root = {}
+    heap = []
+    order = itertools.count()
+    n_leaves = 1
+    push_candidate(ctx, heap, order, root, start, end, mask, depth, hist, class_counts)
+
+    recorder = ctx['recorder']
+    while heap:
+        node, start, end, mask, depth, hist, split, majority, token = heapq.heappop(heap)[2]
+        if recorder is not None:
+            token = recorder.resume_node(token)
+        keys = child_keys(ctx, split)
+        if n_leaves + len(keys) - 1 > max_leaves:
+            node['label'] = majority
+            if recorder is not None:
+                recorder.end_node(token, depth, end - start)
+            continue
+        n_leaves += len(keys) - 1
+
+        children = split_node(ctx, node, start, end, mask, depth, hist, split)
+        if recorder is not None:
+            recorder.end_node(token, depth, end - start, split[0])
+        for att_value, child_idx in keys:
+            args = children[child_idx]
+            child = node['nodes'][att_value] = {}
+            if args[1] == args[0]:
+                child['label'] = majority
+            else:
+                push_candidate(ctx, heap, order, child, *args)
+
+    return root
+
+
+def _grow_task(start, end, mask, depth, hist, class_counts):
+    codes, perm, context = worker_arrays()
+    sink = MemorySink() if context['instrument'] else None
+    recorder = Recorder(sink) if sink is not None else None
+    ctx = dict(context, codes=codes, perm=perm, pool=None, recorder=recorder)
+    node = grow(ctx, start, end, mask, depth, hist, class_counts)
+    # flat, since pickling a nested dict recurses once per level
+    return flatten_tree(node), sink.records if sink is not None else None
+
+
+def build_tree(data, uniqs, remaining_atts, target_attribute, criterion='entropy',
+               depth=None, node_info='entropy', workers=None, max_leaves=None,
+               min_samples_split=None, min_gain=None, recorder=None, max_features=None,
+               seed=0):
+    if max_leaves is not None and max_leaves < 1:
+        raise ValueError('max_leaves must be at least 1, got {}'.format(max_leaves))
+    atts = [att for att in data['header'] if att in remaining_atts]
+    context = new_context(data, uniqs, atts, target_attribute, get_criterion(criterion),
+                          node_info, min_samples_split, min_gain, max_features, seed, depth)
+    context['instrument'] = recorder is not None
+    ctx = dict(context, codes=data['codes'], perm=np.array(data['rows'], dtype=np.intp),
+               pool=None, pending=[], recorder=recorder)
+    if workers:
+        pool = SharedPool(ctx['codes'], ctx['perm'], workers, context=context)
+        ctx.update(codes=pool.codes, perm=pool.perm, pool=pool)
+
+    try:
+        stats = data.get('stats')
+        if stats is not None and stats['target_attribute'] == target_attribute \
+                and stats['rows'] is data['rows']:
+            class_counts = stats['class_counts']
+            hist = np.concatenate([stats['marginals'][att] for att in atts] +
+                                  [np.zeros((0, ctx['n_classes']), dtype=np.int64)])
+        else:
+            class_counts = np.bincount(ctx['codes'][ctx['target_idx']][ctx['perm']],
+                                       minlength=ctx['n_classes'])
+            hist = scan_hist(ctx, 0, len(ctx['perm']))
+
+        mask = (1 << len(atts)) - 1
+        if max_leaves is None:
+            root = grow(ctx, 0, len(ctx['perm']), mask, 0, hist, class_counts)
+        else:
+            root = grow_best_first(ctx, 0, len(ctx['perm']), mask, 0, hist, class_counts,
+                                   max_leaves)
+        for nodes, att_value, future in ctx['pending']:
+            flat, records = future.result()
+            nodes[att_value] = unflatten_tree(flat)
+            if recorder is not None:
+                recorder.merge(records)
+        return root
+    finally:
+        if ctx['pool'] is not None:
+            ctx['codes'] = ctx['perm'] = None
+            ctx['pool'].close()
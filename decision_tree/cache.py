@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+'''
+On-disk cache of encoded datasets.
+
+``load_cached`` keeps the result of ``load_csv_to_header_data`` next to the
+CSV, in a hidden ``.<csv name>.cache`` directory:
+
+    .data.csv.cache
+    ├── fingerprint.json        # size, mtime and sha256 of the CSV
+    └── <key>                   # one entry per (CSV content, projected columns)
+        ├── codes.npy           # the encoded columns, memory-mapped on load
+        └── meta.json           # header and value tables
+
+The CSV is only hashed again when its size or mtime changed, so a warm load
+costs a stat, a small JSON read and an ``mmap`` instead of a parse.
+'''
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from .dataset import CHUNK_ROWS, get_header_name_to_idx_maps, load_csv_to_header_data
+
+CACHE_VERSION = 1
+
+
+def cache_dir(filename):
+    head, tail = os.path.split(os.path.abspath(filename))
+    return os.path.join(head, '.' + tail + '.cache')
+
+
+def file_digest(filename, root):
+    st = os.stat(filename)
+    fingerprint_file = os.path.join(root, 'fingerprint.json')
+    try:
+        with open(fingerprint_file) as f:
+            fingerprint = json.load(f)
+        if fingerprint['size'] == st.st_size and fingerprint['mtime_ns'] == st.st_mtime_ns:
+            return fingerprint['sha256']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    fingerprint = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': sha.hexdigest()}
+    try:
+        os.makedirs(root, exist_ok=True)
+        with open(fingerprint_file, 'w') as f:
+            json.dump(fingerprint, f)
+    except OSError:
+        pass
+    return fingerprint['sha256']
+
+
+def entry_key(digest, columns):
+    columns = None if columns is None else sorted(set(columns))
+    key = json.dumps([CACHE_VERSION, digest, columns])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]
+
+
+def write_entry(entry, data, digest):
+    root = os.path.dirname(entry)
+    tmp = tempfile.mkdtemp(prefix='.tmp-', dir=root)
+    try:
+        os.chmod(tmp, 0o755)
+        np.save(os.path.join(tmp, 'codes.npy'), np.ascontiguousarray(data['codes']))
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'sha256': digest,
+                       'header': data['header'], 'values': data['values']}, f)
+        os.rename(tmp, entry)
+    except OSError:
+        # another process wrote the same entry first, or the directory is read-only
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def open_entry(entry):
+    # the entry's metadata and its codes, memory-mapped
+    with open(os.path.join(entry, 'meta.json')) as f:
+        meta = json.load(f)
+    return meta, np.load(os.path.join(entry, 'codes.npy'), mmap_mode='r')
+
+
+def read_entry(entry):
+    meta, codes = open_entry(entry)
+    idx_to_name, name_to_idx = get_header_name_to_idx_maps(meta['header'])
+    return {
+        'header': meta['header'],
+        'name_to_idx': name_to_idx,
+        'idx_to_name': idx_to_name,
+        'codes': codes,
+        'values': meta['values'],
+        'value_to_code': [{v: i for i, v in enumerate(table)} for table in meta['values']],
+        'rows': np.arange(codes.shape[1], dtype=np.intp)
+    }
+
+
+def drop_stale_entries(root, digest):
+    for name in os.listdir(root):
+        meta_file = os.path.join(root, name, 'meta.json')
+        try:
+            with open(meta_file) as f:
+                stale = json.load(f).get('sha256') != digest
+        except (OSError, ValueError):
+            continue
+        if stale:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def find_entry(filename, columns=None):
+    # the cache entry of the file, if one was written; never builds it
+    root = cache_dir(filename)
+    if not os.path.isdir(root):
+        return None
+    entry = os.path.join(root, entry_key(file_digest(filename, root), columns))
+    return entry if os.path.exists(os.path.join(entry, 'meta.json')) else None
+
+
+def load_cached(filename, columns=None, chunk_size=CHUNK_ROWS):
+    root = cache_dir(filename)
+    digest = file_digest(filename, root)
+    entry = os.path.join(root, entry_key(digest, columns))
+    if os.path.exists(os.path.join(entry, 'meta.json')):
+        return read_entry(entry)
+
+    data = load_csv_to_header_data(filename, columns, chunk_size)
+    if os.path.isdir(root):
+        drop_stale_entries(root, digest)
+        write_entry(entry, data, digest)
+    return data
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+'''
+Command line entry points.
+
+    dt-id3 CONFIG              full tree with information gain
+    dt-gini CONFIG             full tree with the gini index
+    dt-tree [CONFIG]           full tree with information gain, data/data.cfg by default
+    dt-limiting-depth CONFIG   depth 5 tree and 5-fold cross-validation over depths
+    dt-forest CONFIG           bagged forest of ID3 trees, see forest.py
+    dt-serve MODEL             prediction server for a saved model, see server.py
+
+CONFIG is a config file as described in the README.  The top-level scripts
+id3.py, gini.py, tree.py and limiting_depth.py call the same functions.
+'''
+
+import argparse
+
+from .builder import build_tree
+from .common import (load_training_data, build_options, open_recorder, print_tree, print_errors,
+                     get_depth)
+from .compiled import compile_tree
+from .cv import cross_validate
+from .dataset import load_config
+from .forest import train_forest
+from .instrument import phase
+from .model import save_model
+from .outofcore import train_out_of_core
+from .server import MAX_BATCH, MAX_DELAY, serve as serve_model
+
+
+def parse_config_arg(argv, description, default=None):
+    parser = argparse.ArgumentParser(description=description)
+    if default is None:
+        parser.add_argument('config_file')
+    else:
+        parser.add_argument('config_file', nargs='?', default=default)
+    return parser.parse_args(argv).config_file
+
+
+def full_tree(config_file, criterion, node_info='entropy', recorder=None):
+    config = load_config(config_file)
+    if config.get('out_of_core'):
+        root, data = out_of_core_tree(config, criterion, node_info, recorder)
+        target_attribute = config['target_attribute']
+    else:
+        config, data, uniqs, remaining_attributes, target_attribute = \
+            load_training_data(config_file, recorder)
+        with phase(recorder, 'build'):
+            root = build_tree(data, uniqs, remaining_attributes, target_attribute, criterion,
+                              node_info=node_info, recorder=recorder, **build_options(config))
+
+    print_tree(root)
+
+    tree = compile_tree(root, data, target_attribute, unseen=config.get('unseen'))
+    if config.get('model_file'):
+        save_model(tree, config['model_file'])
+    return root, tree
+
+
+def out_of_core_tree(config, criterion, node_info, recorder=None):
+    # the same tree, streamed from the CSV or its cache one level at a time
+    if config.get('unseen') is not None:
+        raise ValueError("'unseen' needs the training rows, which 'out_of_core' does not load")
+    options = {name: config[name] for name in ('min_samples_split', 'min_gain', 'max_bins')
+               if name in config}
+    with phase(recorder, 'build'):
+        return train_out_of_core(config['data_file'], config['target_attribute'],
+                                 config['data_project_columns'], criterion, node_info=node_info,
+                                 numeric=config.get('numeric_attributes'), **options)
+
+
+def id3(argv=None):
+    config_file = parse_config_arg(argv, 'Build a decision tree with ID3.')
+    recorder = open_recorder(config_file)
+    root, tree = full_tree(config_file, 'entropy', recorder=recorder)
+    with phase(recorder, 'evaluate'):
+        print_errors(tree)
+    print('Maximum Depth of Tree is : ', get_depth(root))
+    if recorder is not None:
+        recorder.close()
+
+
+def gini(argv=None):
+    config_file = parse_config_arg(argv, 'Build a decision tree with the gini index.')
+    recorder = open_recorder(config_file)
+    root, tree = full_tree(config_file, 'gini', node_info='Info-Gain', recorder=recorder)
+    print('Depth of Decision tree is  : ', get_depth(root))
+    with phase(recorder, 'evaluate'):
+        print_errors(tree)
+    if recorder is not None:
+        recorder.close()
+
+
+def tree(argv=None):
+    config_file = parse_config_arg(argv, 'Build a decision tree with ID3.', 'data/data.cfg')
+    recorder = open_recorder(config_file)
+
+    # # 1. Implementation: Full trees
+
+    # ## a. Decision Tree
+    root, compiled = full_tree(config_file, 'entropy', recorder=recorder)
+
+    # ## b. Error on train.csv
+    # ## c. Error on test.csv
+    with phase(recorder, 'evaluate'):
+        print_errors(compiled)
+
+    # ## d. Maximum Depth Of Tree
+    print('Maximum Depth of Tree is : ', get_depth(root))
+    if recorder is not None:
+        recorder.close()
+
+
+def forest(argv=None):
+    config_file = parse_config_arg(argv, 'Train a bagged forest of decision trees.')
+    config, data, uniqs, remaining_attributes, target_attribute = load_training_data(config_file)
+
+    options = {name: config[name] for name in ('n_trees', 'max_features', 'seed') if name in config}
+    model = train_forest(data, uniqs, remaining_attributes, target_attribute,
+                         unseen=config.get('unseen'), workers=config.get('workers'), **options)
+
+    print('Forest of {} trees'.format(len(model['trees'])))
+    print_errors(model)
+
+
+def limiting_depth(argv=None):
+    config_file = parse_config_arg(argv, 'Cross-validate the depth of ID3 trees.')
+    config, data, uniqs, remaining_attributes, target_attribute = load_training_data(config_file)
+
+    root = build_tree(data, uniqs, remaining_attributes, target_attribute, 'entropy',
+                      depth=5, node_info='Info-Gain', **build_options(config))
+
+    print_tree(root)
+
+    # # 3. Limiting Depth
+
+    # a.Run 5-fold cross-validation using the specified files. Experiment with
+    # depths in the set 1, 2, 3, 4, 5, 10, 15, reporting the average cross-validation
+    # accuracy and standard deviation for each depth. Explicitly specify which depth
+    # should be chosen as the best, and explain why.
+
+    cross_folds = ['cross_fold_1234','cross_fold_1235','cross_fold_1245','cross_fold_1345','cross_fold_2345']
+    depths = [1, 2, 3, 4, 5, 10, 15]
+    folds = [('data/CVfolds/fold{}.cfg'.format(k), 'data/CVfolds/fold{}.csv'.format(k))
+             for k in range(len(cross_folds), 0, -1)]
+
+    results = cross_validate(folds, depths, workers=config.get('workers'))
+
+    for i in range(len(cross_folds)):
+        acc = [result['accuracies'][i] for result in results]
+        for depth, fold_acc in zip(depths, acc):
+            print('='*50)
+            print('Depth : ',depth)
+            print('Cross Validation Accuracy on fold{}.csv ::: {} '.format(len(cross_folds)-i, fold_acc))
+        print('#'*50)
+        print('Max Accuracy is {} for depth {} .'.format(max(acc),depths[acc.index(max(acc))]))
+        print('#'*50)
+
+    print('Depth  |  Mean Accuracy  |  Std')
+    for result in results:
+        print('{:>5}  |  {:>13.4f}  |  {:.4f}'.format(result['depth'], result['mean'], result['std']))
+    best = max(results, key=lambda result: result['mean'])
+    print('Best depth is {} with mean accuracy {} .'.format(best['depth'], best['mean']))
+
+
+def serve(argv=None):
+    parser = argparse.ArgumentParser(description='Serve predictions of a saved model.')
+    parser.add_argument('model_file')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--unix-socket', help='listen on this Unix socket instead of a TCP port')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH,
+                        help='most rows scored in one batch (default %(default)s)')
+    parser.add_argument('--max-delay-ms', type=float, default=MAX_DELAY * 1000,
+                        help='longest a request waits for others to join its batch (default %(default)s)')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args(argv)
+    serve_model(args.model_file, args.host, args.port, args.unix_socket,
+                args.max_batch, args.max_delay_ms / 1000, args.verbose)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+'''
+Helpers shared by the commands in cli.py: loading
+the training data a config describes, printing the tree and its rules, and
+reporting errors on the train and test files.
+'''
+
+import os
+import sys
+
+from .cache import load_cached
+from .dataset import load_config, project_columns, compute_stats
+from .evaluate import error_rate
+from .instrument import JsonLinesSink, Recorder, phase
+from .numeric import LEFT, RIGHT, bin_configured, to_numbers
+from .structure import write_rules, tree_stats, write_tree
+
+
+def load_training_data(config_file, recorder=None):
+    config = load_config(config_file)
+
+    with phase(recorder, 'load'):
+        data = load_cached(config['data_file'], config['data_project_columns'])
+    with phase(recorder, 'project'):
+        data = project_columns(data, config['data_project_columns'])
+        data = bin_configured(data, config)
+
+    target_attribute = config['target_attribute']
+    remaining_attributes = set(data['header'])
+    remaining_attributes.remove(target_attribute)
+
+    with phase(recorder, 'uniqs'):
+        uniqs = compute_stats(data, target_attribute)['values']
+    return config, data, uniqs, remaining_attributes, target_attribute
+
+
+def open_recorder(config_file):
+    # a recorder writing to the config's 'trace_file', if it names one
+    trace_file = load_config(config_file).get('trace_file')
+    if trace_file is None:
+        return None
+    return Recorder(JsonLinesSink(trace_file))
+
+
+def build_options(config):
+    # the build_tree arguments a config may set
+    names = ('workers', 'max_leaves', 'min_samples_split', 'min_gain')
+    return {name: config[name] for name in names if name in config}
+
+
+def get_label(root, example):
+    node = root
+    while node is not None and 'label' not in node:
+        value = example.get(node['attribute'])
+        if 'threshold' in node:
+            # missing values go right, as in the compiled tree
+            number = to_numbers([value])[0]
+            value = LEFT if number <= node['threshold'] else RIGHT
+        node = node['nodes'].get(value)
+    return None if node is None else node['label']
+
+
+def pretty_print_tree(root):
+    write_rules(root, sys.stdout)
+
+
+def get_depth(root):
+    return tree_stats(root)['depth']
+
+
+def print_tree(root):
+    print('='*50)
+    print('Constructed Decision Tree is given below >>>>>>> ')
+    write_tree(root, sys.stdout)
+    print()
+    print('='*50)
+    print('Rules derived from constructed tree are :: ')
+    pretty_print_tree(root)
+    print('='*50)
+
+
+def print_errors(tree, train_file='data/train.csv', test_file='data/test.csv'):
+    print('Error on {} is  ::: {} % '.format(os.path.basename(train_file),
+                                             error_rate(tree, load_cached(train_file))*100))
+    print('Error on {} is  ::: {} % '.format(os.path.basename(test_file),
+                                             error_rate(tree, load_cached(test_file))*100))
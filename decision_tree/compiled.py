@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+'''
+Flat array form of a trained tree and batch prediction over encoded rows.
+
+``compile_tree`` turns the nested dict returned by ``id3`` into a dict of
+NumPy arrays, one entry per node:
+
+{
+   'feature' : column index tested by the node, -1 for leaves,
+   'offset' : start of the node's slots in 'children',
+   'children' : child node id of every value code, plus one slot for
+                codes the node has no child for,
+   'label' : label code of leaves, -1 when the tree has no answer,
+   'unseen' : per column, the code used for values outside its table,
+   'bins' : per column, the bin edges of a numeric column (see numeric.py),
+            None for the others,
+   'header', 'values', 'target_attribute' : the encoding of the dataset
+}
+
+A threshold node of a numeric attribute gets a slot per bin like any other
+node; the slots of the bins up to its threshold lead to its left child and
+the others, the missing bin and unseen slot included, to its right child.
+
+``predict_batch`` moves every row of an encoded matrix one level down the tree
+per step with fancy indexing, instead of walking the dict row by row.
+
+By default a value a node has no child for, including values outside the
+column's table, leads to node 0 and predicts nothing.  ``unseen`` resolves
+those slots when the tree is compiled, from the training rows routed
+through it:
+
+    'majority'   a leaf with the majority label of the node's training rows
+    'frequent'   the node's child that received the most training rows
+
+so every row gets a label and unseen values cost one lookup like any other.
+'''
+
+import numpy as np
+
+from .numeric import LEFT, RIGHT
+
+
+UNSEEN_POLICIES = (None, 'majority', 'frequent')
+
+
+def compile_tree(root, data, target_attribute, unseen=None):
+    if unseen not in UNSEEN_POLICIES:
+        raise ValueError('unknown unseen value policy {!r}, expected one of {}'.format(
+            unseen, ', '.join(repr(policy) for policy in UNSEEN_POLICIES)))
+    name_to_idx = data['name_to_idx']
+    target_idx = name_to_idx[target_attribute]
+    label_to_code = data['value_to_code'][target_idx]
+    bins = data.get('bins', {})
+
+    feature = []
+    offset = []
+    label = []
+    children = []
+
+    # node 0 is the leaf every missing branch goes to
+    feature.append(-1)
+    offset.append(0)
+    label.append(-1)
+
+    pending = [(root, [])]
+    while pending:
+        node, slots = pending.pop()
+        node_id = len(feature)
+        for slot in slots:
+            children[slot] = node_id
+
+        if 'label' in node:
+            feature.append(-1)
+            offset.append(0)
+            label.append(label_to_code.get(node['label'], -1))
+            continue
+
+        att_idx = name_to_idx[node['attribute']]
+        value_to_code = data['value_to_code'][att_idx]
+        feature.append(att_idx)
+        offset.append(len(children))
+        label.append(-1)
+
+        base = len(children)
+        children.extend([0] * (len(value_to_code) + 1))
+        if 'threshold' in node:
+            # bins up to the one whose upper edge is the threshold go left
+            cut = base + int(np.searchsorted(bins[node['attribute']], node['threshold'])) + 1
+            sides = {LEFT: range(base, cut), RIGHT: range(cut, base + len(value_to_code) + 1)}
+            for side, subnode in node['nodes'].items():
+                pending.append((subnode, sides[side]))
+            continue
+        for att_value, subnode in node['nodes'].items():
+            pending.append((subnode, [base + value_to_code[att_value]]))
+
+    tree = {
+        'feature': np.array(feature, dtype=np.int32),
+        'offset': np.array(offset, dtype=np.int64),
+        'children': np.array(children, dtype=np.int32),
+        'label': np.array(label, dtype=np.int32),
+        'unseen': np.array([len(v) for v in data['values']], dtype=np.int64),
+        'bins': [bins.get(att) for att in data['header']],
+        'header': list(data['header']),
+        'values': data['values'],
+        'target_attribute': target_attribute
+    }
+    if unseen is not None:
+        fill_fallbacks(tree, node_class_counts(tree, data), unseen)
+    return tree
+
+
+def node_class_counts(tree, data):
+    # (node x class) counts of the training rows that pass through each node
+    feature = tree['feature']
+    offset = tree['offset']
+    children = tree['children']
+    codes = data['codes']
+    rows = data['rows']
+    target = codes[tree['header'].index(tree['target_attribute'])][rows].astype(np.intp)
+    n_classes = len(tree['values'][tree['header'].index(tree['target_attribute'])])
+    n_nodes = len(feature)
+
+    counts = np.zeros(n_nodes * n_classes, dtype=np.int64)
+    node = np.ones(len(rows), dtype=np.int32)
+    active = np.flatnonzero(feature[node] >= 0)
+    while active.size:
+        cur = node[active]
+        counts += np.bincount(cur * n_classes + target[active], minlength=n_nodes * n_classes)
+        node[active] = children[offset[cur] + codes[feature[cur], rows[active]]]
+        active = active[feature[node[active]] >= 0]
+    counts += np.bincount(node * n_classes + target, minlength=n_nodes * n_classes)
+    return counts.reshape(n_nodes, n_classes)
+
+
+def fill_fallbacks(tree, counts, policy):
+    # point the missing slots of every internal node at its fallback
+    feature = tree['feature']
+    offset = tree['offset']
+    children = tree['children']
+    unseen = tree['unseen']
+
+    if policy == 'majority':
+        # one leaf per label, appended after the tree's own nodes
+        n_classes = counts.shape[1]
+        first_leaf = len(feature)
+        tree['feature'] = np.concatenate([feature, np.full(n_classes, -1, dtype=np.int32)])
+        tree['offset'] = np.concatenate([offset, np.zeros(n_classes, dtype=np.int64)])
+        tree['label'] = np.concatenate([tree['label'], np.arange(n_classes, dtype=np.int32)])
+
+    for node in np.flatnonzero(feature >= 0):
+        slots = children[offset[node]:offset[node] + unseen[feature[node]] + 1]
+        if policy == 'majority':
+            fallback = first_leaf + int(np.argmax(counts[node]))
+        else:
+            present = slots[slots != 0]
+            fallback = present[int(np.argmax(counts[present].sum(axis=1)))]
+        slots[slots == 0] = fallback
+
+
+def predict_batch(tree, X):
+    feature = tree['feature']
+    offset = tree['offset']
+    children = tree['children']
+    unseen = tree['unseen']
+
+    node = np.ones(X.shape[0], dtype=np.int32)
+    active = np.flatnonzero(feature[node] >= 0)
+    while active.size:
+        cur = node[active]
+        att = feature[cur]
+        codes = np.minimum(X[active, att], unseen[att])
+        node[active] = children[offset[cur] + codes]
+        active = active[feature[node[active]] >= 0]
+
+    return tree['label'][node]
+
+
+def decode_labels(tree, label_codes):
+    table = tree['values'][tree['header'].index(tree['target_attribute'])]
+    decoded = np.array(list(table) + [None], dtype=object)
+    return decoded[label_codes]
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+'''
+Impurity criteria for the tree builder.
+
+A criterion works on class count arrays: ``node_impurity`` takes the class
+counts of a node, ``split_impurity`` a (attribute value x class) contingency
+table and returns the impurity of the split weighted by partition size.
+``split_impurities`` does the same for the stacked tables of many attributes.
+
+Entropy is computed from a lookup table of ``n * log2(n)`` for integer n,
+since for counts c_1..c_k summing to n
+
+    H = (n log2 n - sum(c_i log2 c_i)) / n
+
+so scoring a split is a gather and a few sums instead of a log per cell.
+The table grows on demand up to ``NLOG2N_TABLE_SIZE`` entries, the few
+counts past it being computed directly, and is not pickled, every process
+builds its own.
+'''
+
+import numpy as np
+
+# 512 KB of float64; the counts of large nodes are few and computed directly
+NLOG2N_TABLE_SIZE = 1 << 16
+
+
+class Criterion(object):
+    name = None
+
+    def impurity(self, counts):
+        raise NotImplementedError
+
+    def node_impurity(self, class_counts):
+        return float(self.impurity(class_counts))
+
+    def split_impurity(self, table):
+        partition_n = table.sum(axis=1)
+        n = partition_n.sum()
+        return float(np.dot(partition_n / n, self.impurity(table)))
+
+    def split_impurities(self, hist, starts):
+        # split_impurity of every attribute of a stacked histogram at once,
+        # ``starts`` being the first row of each attribute's table
+        value_n = hist.sum(axis=1)
+        n = np.add.reduceat(value_n, starts)
+        return np.add.reduceat(value_n * self.impurity(hist), starts) / np.maximum(n, 1)
+
+    def __repr__(self):
+        return '{}()'.format(type(self).__name__)
+
+
+class Entropy(Criterion):
+    name = 'entropy'
+
+    def __init__(self):
+        self._nlog2n = np.zeros(1)
+
+    def nlog2n(self, counts):
+        counts = np.asarray(counts, dtype=np.intp)
+        top = int(counts.max()) if counts.size else 0
+        if top >= len(self._nlog2n) and len(self._nlog2n) < NLOG2N_TABLE_SIZE:
+            size = min(max(top + 1, 2 * len(self._nlog2n)), NLOG2N_TABLE_SIZE)
+            n = np.arange(1, size, dtype=np.float64)
+            self._nlog2n = np.concatenate(([0.0], n * np.log2(n)))
+        if top < len(self._nlog2n):
+            return self._nlog2n[counts]
+        large = counts >= len(self._nlog2n)
+        values = np.array(self._nlog2n[np.where(large, 0, counts)])
+        n = counts[large].astype(np.float64)
+        values[large] = n * np.log2(n)
+        return values
+
+    def impurity(self, counts):
+        counts = np.asarray(counts)
+        n = counts.sum(axis=-1)
+        n_safe = np.maximum(n, 1)
+        return (self.nlog2n(n) - self.nlog2n(counts).sum(axis=-1)) / n_safe
+
+    def split_impurity(self, table):
+        partition_n = table.sum(axis=1)
+        n = partition_n.sum()
+        return float((self.nlog2n(partition_n).sum() - self.nlog2n(table).sum()) / n)
+
+    def split_impurities(self, hist, starts):
+        value_n = hist.sum(axis=1)
+        n = np.add.reduceat(value_n, starts)
+        terms = self.nlog2n(value_n) - self.nlog2n(hist).sum(axis=1)
+        return np.add.reduceat(terms, starts) / np.maximum(n, 1)
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+
+class Gini(Criterion):
+    name = 'gini'
+
+    def impurity(self, counts):
+        counts = np.asarray(counts, dtype=np.float64)
+        n = counts.sum(axis=-1)
+        sq = (counts * counts).sum(axis=-1)
+        return 1 - sq / np.maximum(n * n, 1)
+
+
+class Misclassification(Criterion):
+    name = 'misclassification'
+
+    def impurity(self, counts):
+        counts = np.asarray(counts, dtype=np.float64)
+        n = counts.sum(axis=-1)
+        return 1 - counts.max(axis=-1) / np.maximum(n, 1)
+
+
+CRITERIA = {criterion.name: criterion for criterion in (Entropy, Gini, Misclassification)}
+
+
+def get_criterion(criterion):
+    if isinstance(criterion, Criterion):
+        return criterion
+    if criterion not in CRITERIA:
+        raise ValueError('unknown criterion {!r}, expected one of {}'.format(
+            criterion, ', '.join(sorted(CRITERIA))))
+    return CRITERIA[criterion]()
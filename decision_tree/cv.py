@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+'''
+Cross-validation over a (fold x depth) grid.
+
+Every fold's training and held-out data are loaded and encoded once.  The
+(fold, depth) jobs then run on a process pool whose workers receive the
+encoded folds once, in their initializer, and each job only names the fold
+and the depth it trains.
+
+``cross_validate`` returns one result per depth:
+
+{'depth': DEPTH, 'accuracies': [ACCURACY ON EVERY FOLD], 'mean': MEAN, 'std': STD}
+
+with accuracies in percent and ``std`` the population standard deviation.
+'''
+
+import concurrent.futures
+
+import numpy as np
+
+from .builder import build_tree
+from .cache import load_cached
+from .compiled import compile_tree
+from .dataset import load_config, project_columns, compute_stats
+from .evaluate import accuracy
+from .numeric import bin_configured
+
+_folds = []
+
+
+def load_fold(config_file, test_file):
+    config = load_config(config_file)
+    data = load_cached(config['data_file'], config['data_project_columns'])
+    data = project_columns(data, config['data_project_columns'])
+    data = bin_configured(data, config)
+    target_attribute = config['target_attribute']
+    return {
+        'data': data,
+        'uniqs': compute_stats(data, target_attribute)['values'],
+        'remaining_atts': set(data['header']) - {target_attribute},
+        'target_attribute': target_attribute,
+        'test': load_cached(test_file, config['data_project_columns'])
+    }
+
+
+def fold_accuracy(fold, depth, criterion='entropy'):
+    root = build_tree(fold['data'], fold['uniqs'], fold['remaining_atts'],
+                      fold['target_attribute'], criterion, depth=depth, node_info='Info-Gain')
+    tree = compile_tree(root, fold['data'], fold['target_attribute'])
+    return accuracy(tree, fold['test']) * 100
+
+
+def _init_worker(folds):
+    _folds[:] = folds
+
+
+def _fold_job(fold_idx, depth, criterion):
+    return fold_accuracy(_folds[fold_idx], depth, criterion)
+
+
+def cross_validate(folds, depths, criterion='entropy', workers=None):
+    folds = [load_fold(config_file, test_file) for config_file, test_file in folds]
+    jobs = [(fold_idx, depth) for fold_idx in range(len(folds)) for depth in depths]
+
+    if workers:
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(folds,)) as executor:
+            futures = [executor.submit(_fold_job, fold_idx, depth, criterion)
+                       for fold_idx, depth in jobs]
+            scores = [future.result() for future in futures]
+    else:
+        scores = [fold_accuracy(folds[fold_idx], depth, criterion) for fold_idx, depth in jobs]
+
+    scores = np.array(scores).reshape(len(folds), len(depths))
+    results = []
+    for j, depth in enumerate(depths):
+        results.append({
+            'depth': depth,
+            'accuracies': scores[:, j].tolist(),
+            'mean': float(scores[:, j].mean()),
+            'std': float(scores[:, j].std())
+        })
+    return results
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+'''
+Columnar dataset shared by the decision tree scripts.
+
+Every column of the CSV is dictionary-encoded once into a NumPy array of
+small integer codes.  The original strings are kept in one value table per
+column, so ``data['values'][j][code]`` gives back the cell as it was read.
+
+A dataset is a plain dict, like the row based one it replaces:
+
+{
+   'header' : [COLUMN_NAMES],
+   'name_to_idx' : {name : column index},
+   'idx_to_name' : {column index : name},
+   'codes' : array of shape (n_columns, n_all_rows), one code row per column,
+   'values' : [value table of every column],
+   'value_to_code' : [{value : code} of every column],
+   'rows' : indices of the rows that belong to this dataset,
+   'stats' : set by ``compute_stats``, see below
+}
+
+CSV files are read and encoded ``CHUNK_ROWS`` rows at a time, so only one
+chunk of raw text is alive at once next to the encoded columns.  Passing
+``columns`` to the loader skips every other column while reading.
+
+``compute_stats`` makes one vectorized pass over the rows and attaches to the
+dataset, for every column, its value table, how often each value occurs and
+the (value x class) counts.  The builder starts from those counts instead of
+rescanning the root, and child enumeration uses the value tables.
+'''
+
+import ast
+import csv
+import itertools
+
+import numpy as np
+
+from .scoring import count_tables
+
+# rows parsed from the CSV before they are encoded and dropped
+CHUNK_ROWS = 65536
+
+
+def load_config(config_file):
+    with open(config_file, 'r') as myfile:
+        data = myfile.read().replace('\n', '')
+    return ast.literal_eval(data)
+
+
+def get_header_name_to_idx_maps(headers):
+    name_to_idx = {}
+    idx_to_name = {}
+    for i in range(0, len(headers)):
+        name_to_idx[headers[i]] = i
+        idx_to_name[i] = headers[i]
+    return idx_to_name, name_to_idx
+
+
+def code_dtype(n_values):
+    # smallest unsigned type able to hold every code of a column
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if n_values <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+def new_encoder(headers, columns=None):
+    if columns is None:
+        keep = list(range(0, len(headers)))
+    else:
+        _, name_to_idx = get_header_name_to_idx_maps(headers)
+        keep = sorted(set(name_to_idx[name] for name in columns))
+    return {
+        'header': [headers[idx] for idx in keep],
+        'keep': keep,
+        'value_to_code': [{} for _ in keep],
+        'chunks': [[] for _ in keep],
+        'n_rows': 0
+    }
+
+
+def encode_chunk(encoder, rows):
+    n_rows = len(rows)
+    for i, idx in enumerate(encoder['keep']):
+        val_map = encoder['value_to_code'][i]
+        col = np.fromiter((val_map.setdefault(r[idx], len(val_map)) for r in rows),
+                          dtype=np.int64, count=n_rows)
+        encoder['chunks'][i].append(col.astype(code_dtype(len(val_map))))
+    encoder['n_rows'] += n_rows
+
+
+def finish_encoding(encoder):
+    headers = encoder['header']
+    n_rows = encoder['n_rows']
+    value_to_code = encoder['value_to_code']
+    dtype = code_dtype(max([len(v) for v in value_to_code] + [1]))
+
+    codes = np.empty((len(headers), n_rows), dtype=dtype)
+    for i, chunks in enumerate(encoder['chunks']):
+        pos = 0
+        while chunks:
+            chunk = chunks.pop(0)
+            codes[i, pos:pos + len(chunk)] = chunk
+            pos += len(chunk)
+
+    idx_to_name, name_to_idx = get_header_name_to_idx_maps(headers)
+    return {
+        'header': list(headers),
+        'name_to_idx': name_to_idx,
+        'idx_to_name': idx_to_name,
+        'codes': codes,
+        'values': [list(val_map) for val_map in value_to_code],
+        'value_to_code': value_to_code,
+        'rows': np.arange(n_rows, dtype=np.intp)
+    }
+
+
+def load_csv_to_header_data(filename, columns=None, chunk_size=CHUNK_ROWS):
+    with open(filename, newline='') as f:
+        fs = csv.reader(f)
+        encoder = new_encoder(next(fs), columns)
+        while True:
+            chunk = list(itertools.islice(fs, chunk_size))
+            if not chunk:
+                break
+            encode_chunk(encoder, chunk)
+            del chunk
+    return finish_encoding(encoder)
+
+
+def project_columns(data, columns_to_project):
+    columns_to_project_ix = [data['name_to_idx'][name] for name in columns_to_project]
+    columns_to_project_ix = sorted(set(columns_to_project_ix))
+    if columns_to_project_ix == list(range(0, len(data['header']))):
+        return dict(data)
+
+    data_h = [data['header'][cidx] for cidx in columns_to_project_ix]
+    idx_to_name, name_to_idx = get_header_name_to_idx_maps(data_h)
+
+    return {'header': data_h,
+            'name_to_idx': name_to_idx,
+            'idx_to_name': idx_to_name,
+            'codes': data['codes'][columns_to_project_ix],
+            'values': [data['values'][cidx] for cidx in columns_to_project_ix],
+            'value_to_code': [data['value_to_code'][cidx] for cidx in columns_to_project_ix],
+            'rows': data['rows']}
+
+
+def compute_stats(data, target_attribute):
+    stats = data.get('stats')
+    if stats is not None and stats['target_attribute'] == target_attribute \
+            and stats['rows'] is data['rows']:
+        return stats
+
+    header = data['header']
+    target_idx = data['name_to_idx'][target_attribute]
+    sizes = [len(table) for table in data['values']]
+    # (value x class) counts of every column, from a single bincount over the rows
+    tables = count_tables(data['codes'], data['rows'], list(range(0, len(header))), sizes,
+                          target_idx, sizes[target_idx])
+
+    stats = {
+        'target_attribute': target_attribute,
+        'rows': data['rows'],
+        'n_rows': len(data['rows']),
+        'values': {header[idx]: data['values'][idx] for idx in range(0, len(header))},
+        'value_counts': {header[idx]: tables[idx].sum(axis=1) for idx in range(0, len(header))},
+        'class_counts': tables[target_idx].sum(axis=0),
+        'marginals': {header[idx]: tables[idx] for idx in range(0, len(header))}
+    }
+    data['stats'] = stats
+    return stats
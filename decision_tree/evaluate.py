@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+'''
+Bulk scoring of a compiled tree on a pandas DataFrame or an encoded dataset.
+
+Columns are matched to tree attributes by name once per call and encoded
+with the tree's value tables, values the tree never saw get the column's
+unseen code.  Numeric columns are binned with the tree's bin edges,
+anything that is not a number is missing (see numeric.py).  Predictions for
+all rows come from a single ``predict_batch``.  Pandas is only imported
+when a DataFrame is encoded.  A forest (see forest.py) can be passed
+wherever a tree is; its members vote.
+'''
+
+import numpy as np
+
+from .compiled import predict_batch, decode_labels
+from .forest import predict_forest
+from .numeric import to_numbers, bin_numbers
+
+
+def encode_frame(tree, frame):
+    import pandas as pd
+
+    n_rows = len(frame)
+    unseen = tree['unseen']
+    X = np.empty((n_rows, len(tree['header'])), dtype=np.int64)
+    for idx, att_name in enumerate(tree['header']):
+        if att_name not in frame.columns:
+            X[:, idx] = unseen[idx]
+            continue
+        col = frame[att_name]
+        if tree['bins'][idx] is not None:
+            numbers = pd.to_numeric(col, errors='coerce').to_numpy(dtype=float)
+            X[:, idx] = bin_numbers(tree['bins'][idx], numbers)
+            continue
+        if col.dtype != object:
+            col = col.astype(str)
+        codes = pd.Categorical(col, categories=tree['values'][idx]).codes
+        X[:, idx] = np.where(codes < 0, unseen[idx], codes)
+    return X
+
+
+def encode_dataset(tree, data):
+    rows = data['rows']
+    unseen = tree['unseen']
+    X = np.empty((len(rows), len(tree['header'])), dtype=np.int64)
+    for idx, att_name in enumerate(tree['header']):
+        if att_name not in data['name_to_idx']:
+            X[:, idx] = unseen[idx]
+            continue
+        col_idx = data['name_to_idx'][att_name]
+        if data['values'][col_idx] is tree['values'][idx]:
+            X[:, idx] = data['codes'][col_idx][rows]
+            continue
+        # translate the dataset's codes to the tree's codes with one lookup table
+        if tree['bins'][idx] is not None:
+            lut = bin_numbers(tree['bins'][idx], to_numbers(data['values'][col_idx]))
+        else:
+            value_to_code = {v: i for i, v in enumerate(tree['values'][idx])}
+            lut = np.array([value_to_code.get(v, unseen[idx]) for v in data['values'][col_idx]],
+                           dtype=np.int64)
+        X[:, idx] = lut[data['codes'][col_idx][rows]]
+    return X
+
+
+def encode(tree, source):
+    if isinstance(source, dict):
+        return encode_dataset(tree, source)
+    return encode_frame(tree, source)
+
+
+def predict_codes(tree, X):
+    if 'trees' in tree:
+        return predict_forest(tree, X)
+    return predict_batch(tree, X)
+
+
+def predict(tree, source):
+    return decode_labels(tree, predict_codes(tree, encode(tree, source)))
+
+
+def count_correct(tree, source):
+    X = encode(tree, source)
+    target = X[:, tree['header'].index(tree['target_attribute'])]
+    return int(np.count_nonzero(predict_codes(tree, X) == target)), len(X)
+
+
+def error_rate(tree, source):
+    correct, total = count_correct(tree, source)
+    return (total - correct) / total
+
+
+def accuracy(tree, source):
+    correct, total = count_correct(tree, source)
+    return correct / total
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+'''
+Bagged ensembles of the tree builder's trees.
+
+``train_forest`` trains ``n_trees`` trees, each on a bootstrap sample of the
+rows and scoring ``max_features`` random candidate attributes per node, and
+compiles them.  With ``workers`` the encoded codes are put in shared memory
+once (see parallel.py) and the trees are trained by a process pool; each
+task only carries the seed of its tree.  A tree's bootstrap sample and
+attribute subsets follow from its seed alone, so the forest is the same
+whatever the number of workers.
+
+A forest is a dict, with the encoding of its trees so evaluate.py and the
+encoders accept it wherever they accept a compiled tree:
+
+{
+   'trees' : [compiled tree of every member],
+   'unseen', 'bins', 'header', 'values', 'target_attribute' : as in a compiled tree
+}
+
+``predict_forest`` scores every member with ``predict_batch`` and takes the
+majority vote of all rows at once with a single ``bincount``.  Members that
+have no label for a row abstain; ties go to the first label in the table.
+'''
+
+import math
+
+import numpy as np
+
+from .builder import build_tree
+from .compiled import compile_tree, predict_batch
+from .parallel import SharedPool, worker_arrays
+
+
+def resolve_max_features(max_features, n_atts):
+    if max_features is None:
+        return None
+    if max_features == 'sqrt':
+        return max(1, int(math.sqrt(n_atts)))
+    if max_features == 'log2':
+        return max(1, int(math.log2(n_atts))) if n_atts > 1 else 1
+    if isinstance(max_features, float):
+        return max(1, int(max_features * n_atts))
+    if isinstance(max_features, int) and max_features >= 1:
+        return max_features
+    raise ValueError("max_features must be None, 'sqrt', 'log2', a fraction or a count, "
+                     "got {!r}".format(max_features))
+
+
+def train_member(data, params, seed):
+    rng = np.random.default_rng(seed)
+    rows = np.asarray(data['rows'])
+    sample = dict(data, rows=rows[rng.integers(len(rows), size=len(rows))])
+    sample.pop('stats', None)
+    root = build_tree(sample, params['uniqs'], params['remaining_atts'],
+                      params['target_attribute'], params['criterion'], depth=params['depth'],
+                      min_samples_split=params['min_samples_split'],
+                      max_features=params['max_features'], seed=seed)
+    return compile_tree(root, sample, params['target_attribute'], unseen=params['unseen'])
+
+
+def _train_task(seed):
+    codes, rows, context = worker_arrays()
+    data = dict(context['data'], codes=codes, rows=rows)
+    return train_member(data, context['params'], seed)
+
+
+def train_forest(data, uniqs, remaining_atts, target_attribute, n_trees=10,
+                 criterion='entropy', max_features='sqrt', depth=None,
+                 min_samples_split=None, unseen=None, seed=0, workers=None):
+    params = {
+        'uniqs': uniqs,
+        'remaining_atts': set(remaining_atts),
+        'target_attribute': target_attribute,
+        'criterion': criterion,
+        'depth': depth,
+        'min_samples_split': min_samples_split,
+        'max_features': resolve_max_features(max_features, len(remaining_atts)),
+        'unseen': unseen
+    }
+    seeds = [int(s) for s in np.random.SeedSequence(seed).generate_state(n_trees)]
+
+    if workers:
+        # the encoding without the codes, which the workers read from shared memory
+        encoding = {key: value for key, value in data.items()
+                    if key not in ('codes', 'rows', 'stats')}
+        context = {'data': encoding, 'params': params}
+        rows = np.asarray(data['rows'], dtype=np.intp)
+        with SharedPool(data['codes'], rows, workers, context=context) as pool:
+            futures = [pool.submit(_train_task, s) for s in seeds]
+            trees = [future.result() for future in futures]
+    else:
+        trees = [train_member(data, params, s) for s in seeds]
+
+    first = trees[0]
+    return {
+        'trees': trees,
+        'unseen': first['unseen'],
+        'bins': first['bins'],
+        'header': first['header'],
+        'values': first['values'],
+        'target_attribute': target_attribute
+    }
+
+
+def predict_forest(forest, X):
+    labels = np.stack([predict_batch(tree, X) for tree in forest['trees']])
+
+    n_rows = X.shape[0]
+    n_classes = len(forest['values'][forest['header'].index(forest['target_attribute'])])
+    row_ids = np.broadcast_to(np.arange(n_rows), labels.shape)
+    voted = labels >= 0
+    votes = np.bincount(row_ids[voted] * n_classes + labels[voted],
+                        minlength=n_rows * n_classes).reshape(n_rows, n_classes)
+    winner = np.argmax(votes, axis=1).astype(np.int32)
+    winner[votes.max(axis=1) == 0] = -1
+    return winner
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+'''
+Optional instrumentation of training runs.
+
+A ``Recorder`` writes records to a sink, anything with ``emit(record)`` and
+``close()``: ``JsonLinesSink`` appends them to a file, one JSON object per
+line, ``MemorySink`` keeps them in a list.  Records are dicts:
+
+{'event': 'node', 'depth': DEPTH, 'rows': ROWS, 'seconds': WALL TIME,
+ 'rows_scanned': ROWS COUNTED, 'candidates': ATTRIBUTES SCORED,
+ 'partitions': CHILD SLICES, 'attribute': SPLIT ATTRIBUTE OR None}
+{'event': 'phase', 'phase': NAME, 'seconds': WALL TIME}
+{'event': 'summary', 'phases': {NAME: SECONDS}, 'nodes': N, 'leaves': N,
+ 'max_depth': DEPTH, 'rows_scanned': N, 'candidates': N, 'partitions': N}
+
+A node's seconds and counts cover its own work only: scoring its split,
+partitioning its slice and counting the histograms of its children, not
+growing the children.  Leaves for values a node's rows do not have cost
+nothing and get no record.  ``rows_scanned`` in the summary also includes
+the scan of the root.  The builder takes a recorder as ``build_tree(...,
+recorder=...)``; without one it does no instrumentation work at all.
+'''
+
+import contextlib
+import json
+import time
+
+COUNTERS = ('rows_scanned', 'candidates', 'partitions')
+
+
+class MemorySink(object):
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink(object):
+    def __init__(self, filename):
+        self.file = open(filename, 'a')
+
+    def emit(self, record):
+        self.file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class Recorder(object):
+    def __init__(self, sink):
+        self.sink = sink
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.phases = {}
+        self.totals = {'nodes': 0, 'leaves': 0, 'max_depth': 0}
+
+    def add(self, counter, n):
+        self.counts[counter] += int(n)
+
+    def start_node(self):
+        return time.perf_counter(), dict(self.counts)
+
+    def pause_node(self, token):
+        # the work done for a node so far, for a node finished later
+        start, counts = token
+        return time.perf_counter() - start, {c: self.counts[c] - counts[c] for c in COUNTERS}
+
+    def resume_node(self, paused):
+        seconds, done = paused
+        return time.perf_counter() - seconds, {c: self.counts[c] - done[c] for c in COUNTERS}
+
+    def end_node(self, token, depth, n_rows, attribute=None):
+        start, counts = token
+        record = {'event': 'node', 'depth': depth, 'rows': int(n_rows),
+                  'seconds': time.perf_counter() - start}
+        for counter in COUNTERS:
+            record[counter] = self.counts[counter] - counts[counter]
+        record['attribute'] = attribute
+        self.node(record)
+
+    def node(self, record):
+        self.totals['nodes'] += 1
+        self.totals['leaves'] += record['attribute'] is None
+        self.totals['max_depth'] = max(self.totals['max_depth'], record['depth'])
+        self.sink.emit(record)
+
+    def merge(self, records):
+        # node records of a subtree grown by a worker process
+        for record in records:
+            for counter in COUNTERS:
+                self.counts[counter] += record[counter]
+            self.node(record)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+            self.sink.emit({'event': 'phase', 'phase': name, 'seconds': seconds})
+
+    def summary(self):
+        summary = {'event': 'summary', 'phases': dict(self.phases)}
+        summary.update(self.totals)
+        summary.update(self.counts)
+        return summary
+
+    def close(self):
+        self.sink.emit(self.summary())
+        self.sink.close()
+
+
+def phase(recorder, name):
+    # recorder.phase(name), or nothing when there is no recorder
+    if recorder is None:
+        return contextlib.nullcontext()
+    return recorder.phase(name)
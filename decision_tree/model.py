@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+'''
+Versioned binary file format for compiled trees.
+
+    offset 0   magic b'DTREEMDL'
+           8   format version, uint32 little endian
+          12   length of the JSON header, uint32 little endian
+          16   JSON header: header, value tables, bin edges, target attribute
+               and, for every node array, its dtype, shape and offset in the
+               file
+         ...   node arrays, each aligned to ALIGNMENT bytes
+
+``load_model`` maps the file and returns the node arrays as read-only views
+on the mapping, so a scoring process gets a tree ready for ``predict_batch``
+without parsing any CSV, importing pandas or retraining.
+'''
+
+import json
+import mmap
+import struct
+
+import numpy as np
+
+MAGIC = b'DTREEMDL'
+# version 2 added the bin edges of numeric columns; version 1 files load
+# with none
+FORMAT_VERSION = 2
+READ_VERSIONS = (1, 2)
+ALIGNMENT = 64
+NODE_ARRAYS = ('feature', 'offset', 'children', 'label', 'unseen')
+
+_PREFIX = struct.Struct('<8sII')
+
+
+def _aligned(pos):
+    return (pos + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_model(tree, filename):
+    arrays = {name: np.ascontiguousarray(tree[name]) for name in NODE_ARRAYS}
+    meta = {
+        'header': tree['header'],
+        'values': tree['values'],
+        'bins': tree['bins'],
+        'target_attribute': tree['target_attribute'],
+        'arrays': {}
+    }
+
+    # offsets depend on the header length, which depends on the offsets
+    pos = 0
+    while True:
+        layout = {}
+        for name, array in arrays.items():
+            layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': pos}
+            pos = _aligned(pos + array.nbytes)
+        meta['arrays'] = layout
+        blob = json.dumps(meta, separators=(',', ':')).encode('utf-8')
+        data_start = _aligned(_PREFIX.size + len(blob))
+        if layout[NODE_ARRAYS[0]]['offset'] == data_start:
+            break
+        pos = data_start
+
+    with open(filename, 'wb') as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(blob)))
+        f.write(blob)
+        for name, array in arrays.items():
+            f.write(b'\0' * (layout[name]['offset'] - f.tell()))
+            f.write(array.tobytes())
+
+
+def load_model(filename):
+    with open(filename, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, blob_len = _PREFIX.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise ValueError('{} is not a decision tree model file'.format(filename))
+    if version not in READ_VERSIONS:
+        raise ValueError('{} has model format version {}, this code reads versions {}'.format(
+            filename, version, ', '.join(str(v) for v in READ_VERSIONS)))
+    meta = json.loads(mm[_PREFIX.size:_PREFIX.size + blob_len].decode('utf-8'))
+
+    tree = {
+        'header': meta['header'],
+        'values': meta['values'],
+        'bins': meta['bins'] if version >= 2 else [None] * len(meta['header']),
+        'target_attribute': meta['target_attribute']
+    }
+    for name, spec in meta['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape']))
+        tree[name] = np.frombuffer(mm, dtype=dtype, count=count,
+                                   offset=spec['offset']).reshape(spec['shape'])
+    return tree
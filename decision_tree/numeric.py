@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+'''
+Numeric attributes, binned once when the data is loaded.
+
+``bin_columns`` replaces the codes of every numeric column by bin codes.
+There are at most ``max_bins`` bins, with edges at quantiles of the column's
+training values, or one bin per distinct number when there are no more.
+Bin i holds the numbers x with ``edges[i - 1] < x <= edges[i]``.  The value
+table of a binned column holds the names of its bins, and ``data['bins']``
+maps the column to its edges, which the compiled tree keeps to bin the raw
+numbers of the rows it scores.  Values that are not numbers, such as empty
+cells, are missing: they take no part in the quantiles and share one more
+bin, ``MISSING``, after the others.
+
+The builder splits a numeric attribute in two, ``att <= threshold`` and
+``att > threshold`` with the threshold one of the edges.  Every edge is scored
+from the cumulative sums of the attribute's (bin x class) counts, so a node
+costs O(bins) per numeric attribute whatever the number of distinct values.
+A numeric attribute stays a candidate below its own split, to be cut again.
+Missing values go to the ``att > threshold`` side, in training and when a
+row is scored.
+'''
+
+import numpy as np
+
+MAX_BINS = 32
+
+# keys of the two children of a threshold split in the nested dict tree
+LEFT = '<='
+RIGHT = '>'
+
+# name of the bin of missing values
+MISSING = 'missing'
+
+
+def to_numbers(values):
+    # floats, NaN for anything that is not a number
+    numbers = np.empty(len(values))
+    for i, value in enumerate(values):
+        try:
+            numbers[i] = float(value)
+        except (TypeError, ValueError):
+            numbers[i] = np.nan
+    return numbers
+
+
+def quantile_edges(numbers, counts, max_bins=MAX_BINS):
+    # ``counts`` weighs each number by its rows, so the bins hold about as
+    # many rows each; equal numbers always share a bin
+    numbers, inverse = np.unique(numbers, return_inverse=True)
+    counts = np.bincount(inverse.ravel(), weights=counts, minlength=len(numbers))
+    numbers = numbers[counts > 0]
+    counts = counts[counts > 0]
+    if len(numbers) <= max_bins:
+        return numbers[:-1].tolist()
+    cumulative = np.cumsum(counts)
+    targets = cumulative[-1] * np.arange(1, max_bins) / max_bins
+    edges = np.unique(numbers[np.searchsorted(cumulative, targets)])
+    return edges[edges < numbers[-1]].tolist()
+
+
+def bin_numbers(edges, numbers):
+    # missing values get the code after the last bin: the MISSING bin of a
+    # column that has one, the unseen code of one that has not
+    codes = np.searchsorted(edges, numbers, side='left').astype(np.int64)
+    codes[np.isnan(numbers)] = len(edges) + 1
+    return codes
+
+
+def bin_names(edges, missing=False):
+    if not edges:
+        names = ['any']
+    else:
+        names = ['<= {!r}'.format(edges[0])]
+        names.extend('({!r}, {!r}]'.format(lo, hi) for lo, hi in zip(edges, edges[1:]))
+        names.append('> {!r}'.format(edges[-1]))
+    return names + [MISSING] if missing else names
+
+
+def value_bins(values, counts, max_bins=MAX_BINS):
+    # the edges and names of a column's bins and the bin of every value of its table
+    numbers = to_numbers(values)
+    missing = np.isnan(numbers)
+    edges = quantile_edges(numbers[~missing], counts[~missing], max_bins)
+    return edges, bin_names(edges, missing.any()), bin_numbers(edges, numbers)
+
+
+def bin_columns(data, atts, max_bins=MAX_BINS):
+    if max_bins < 1:
+        raise ValueError('max_bins must be at least 1, got {}'.format(max_bins))
+    codes = data['codes'].copy()
+    values = list(data['values'])
+    value_to_code = list(data['value_to_code'])
+    bins = dict(data.get('bins', {}))
+    for att in atts:
+        idx = data['name_to_idx'][att]
+        counts = np.bincount(codes[idx][data['rows']], minlength=len(values[idx]))
+        edges, values[idx], lut = value_bins(values[idx], counts, max_bins)
+        codes[idx] = lut[codes[idx]]
+        value_to_code[idx] = {v: i for i, v in enumerate(values[idx])}
+        bins[att] = edges
+
+    binned = dict(data, codes=codes, values=values, value_to_code=value_to_code, bins=bins)
+    binned.pop('stats', None)
+    return binned
+
+
+def bin_configured(data, config):
+    # bin_columns over the config's 'numeric_attributes', if it names any
+    atts = config.get('numeric_attributes')
+    if not atts:
+        return data
+    return bin_columns(data, atts, config.get('max_bins', MAX_BINS))
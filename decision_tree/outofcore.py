@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+
+'''
+Out-of-core training, one streaming pass over the data per tree level.
+
+``train_out_of_core`` never holds more than one chunk of rows.  It reads the
+encoded cache of the CSV when one exists (see cache.py), memory-mapped and
+sliced ``chunk_size`` rows at a time, and the CSV itself otherwise.  With the
+CSV the first pass also learns the value tables, coding values in order of
+first appearance like ``load_csv_to_header_data``, and counts the root.
+
+The tree grows level by level.  The nodes still to be scored, the frontier,
+each get a slot; a pass routes every row of a chunk through the part of the
+tree built so far, the way ``predict_batch`` does, and adds the rows that end
+in a frontier node to that node's (attribute x value x class) counts.  Then
+every frontier node is scored and split with the builder's own
+``score_node`` and ``can_split``, so the tree is the one ``build_tree``
+grows from the same rows, node for node.
+
+Numeric attributes are binned as by ``bin_columns`` (see numeric.py), from
+the value counts of the root, and every chunk is binned as it is read.
+
+Returns the tree and the encoding of the data, a dataset dict without codes
+or rows, which ``compile_tree`` accepts for trees compiled without an
+``unseen`` policy.
+'''
+
+import csv
+import itertools
+
+import numpy as np
+
+from .builder import new_context, score_node, can_split, majority_label, child_keys, fill_split
+from .cache import find_entry, open_entry
+from .dataset import CHUNK_ROWS, get_header_name_to_idx_maps, new_encoder, encode_chunk
+from .numeric import MAX_BINS, value_bins
+
+
+def learn_csv_chunks(filename, columns, chunk_size, encoder_out):
+    # first pass over the CSV: encode it chunk by chunk, keeping only the tables
+    with open(filename, newline='') as f:
+        fs = csv.reader(f)
+        encoder = new_encoder(next(fs), columns)
+        encoder_out.update(encoder)
+        while True:
+            chunk = list(itertools.islice(fs, chunk_size))
+            if not chunk:
+                break
+            encode_chunk(encoder, chunk)
+            yield np.stack([chunks.pop() for chunks in encoder['chunks']]).astype(np.int64)
+
+
+def csv_chunks(filename, keep, value_to_code, chunk_size):
+    with open(filename, newline='') as f:
+        fs = csv.reader(f)
+        next(fs)
+        while True:
+            chunk = list(itertools.islice(fs, chunk_size))
+            if not chunk:
+                break
+            codes = np.empty((len(keep), len(chunk)), dtype=np.int64)
+            for i, idx in enumerate(keep):
+                val_map = value_to_code[i]
+                codes[i] = np.fromiter((val_map[r[idx]] for r in chunk), dtype=np.int64,
+                                       count=len(chunk))
+            yield codes
+
+
+def cache_chunks(entry, chunk_size):
+    _, codes = open_entry(entry)
+    for start in range(0, codes.shape[1], chunk_size):
+        yield np.array(codes[:, start:start + chunk_size], dtype=np.int64)
+
+
+def binned_chunks(chunks, luts):
+    # chunks with the codes of numeric columns replaced by their bins
+    for codes in chunks:
+        for idx, lut in luts.items():
+            codes[idx] = lut[codes[idx]]
+        yield codes
+
+
+def bin_encoding(data, atts, value_counts, max_bins):
+    # bin the numeric columns of the encoding in place; returns the value code
+    # to bin lookup table of every binned column
+    luts = {}
+    data['bins'] = {}
+    for att in atts:
+        idx = data['name_to_idx'][att]
+        edges, data['values'][idx], luts[idx] = value_bins(data['values'][idx],
+                                                           value_counts[idx], max_bins)
+        data['value_to_code'][idx] = {v: i for i, v in enumerate(data['values'][idx])}
+        data['bins'][att] = edges
+    return luts
+
+
+def encoding_dataset(header, values):
+    idx_to_name, name_to_idx = get_header_name_to_idx_maps(header)
+    return {
+        'header': list(header),
+        'name_to_idx': name_to_idx,
+        'idx_to_name': idx_to_name,
+        'values': values,
+        'value_to_code': [{v: i for i, v in enumerate(table)} for table in values]
+    }
+
+
+def learn_and_count_root(filename, columns, chunk_size, target_attribute):
+    # the CSV pass that learns the value tables also counts every column at
+    # the root; tables grow while counting, so the counts grow with them
+    encoder = {}
+    counts = None
+    target_idx = None
+    for codes in learn_csv_chunks(filename, columns, chunk_size, encoder):
+        if counts is None:
+            target_idx = encoder['header'].index(target_attribute)
+            counts = [np.zeros((0, 0), dtype=np.int64) for _ in encoder['header']]
+        sizes = [len(val_map) for val_map in encoder['value_to_code']]
+        n_classes = sizes[target_idx]
+        for i, col in enumerate(codes):
+            chunk_counts = np.bincount(col * n_classes + codes[target_idx],
+                                       minlength=sizes[i] * n_classes)
+            grown = np.zeros((sizes[i], n_classes), dtype=np.int64)
+            grown[:counts[i].shape[0], :counts[i].shape[1]] = counts[i]
+            counts[i] = grown + chunk_counts.reshape(sizes[i], n_classes)
+    if counts is None:
+        raise ValueError('{} has no rows'.format(filename))
+    data = encoding_dataset(encoder['header'],
+                            [list(val_map) for val_map in encoder['value_to_code']])
+    return data, encoder['keep'], counts
+
+
+def count_frontier(ctx, chunks, route, n_frontier):
+    # (frontier node x stacked hist) and (frontier node x class) counts of one pass
+    feature = np.array(route['feature'], dtype=np.int64)
+    offset = np.array(route['offset'], dtype=np.int64)
+    children = np.array(route['children'] + [0], dtype=np.int64)
+    slot = np.array(route['slot'], dtype=np.int64)
+    hist_idxs = np.array(ctx['hist_idxs'], dtype=np.int64)
+    hist_offsets = ctx['hist_starts'][:-1, None]
+    total = int(ctx['hist_starts'][-1])
+    n_classes = ctx['n_classes']
+    target_idx = ctx['target_idx']
+
+    hists = np.zeros(n_frontier * total * n_classes, dtype=np.int64)
+    class_counts = np.zeros(n_frontier * n_classes, dtype=np.int64)
+    for codes in chunks:
+        node = np.ones(codes.shape[1], dtype=np.int64)
+        active = np.flatnonzero(feature[node] >= 0)
+        while active.size:
+            cur = node[active]
+            node[active] = children[offset[cur] + codes[feature[cur], active]]
+            active = active[feature[node[active]] >= 0]
+
+        rows = np.flatnonzero(slot[node] >= 0)
+        if not rows.size:
+            continue
+        slots = slot[node[rows]]
+        target = codes[target_idx, rows]
+        class_counts += np.bincount(slots * n_classes + target, minlength=n_frontier * n_classes)
+        keys = codes[hist_idxs[:, None], rows] + hist_offsets
+        keys += slots * total
+        keys *= n_classes
+        keys += target
+        hists += np.bincount(keys.ravel(), minlength=n_frontier * total * n_classes)
+
+    return (hists.reshape(n_frontier, total, n_classes),
+            class_counts.reshape(n_frontier, n_classes))
+
+
+def value_counts(chunks, sizes):
+    # rows of every value of the columns of ``sizes``, {column: values}, in one pass
+    counts = {idx: np.zeros(size, dtype=np.int64) for idx, size in sizes.items()}
+    for codes in chunks:
+        for idx, col_counts in counts.items():
+            col_counts += np.bincount(codes[idx], minlength=len(col_counts))
+    return counts
+
+
+def train_out_of_core(filename, target_attribute, columns=None, criterion='entropy', depth=None,
+                      node_info='entropy', min_samples_split=None, min_gain=None,
+                      numeric=None, max_bins=MAX_BINS, chunk_size=CHUNK_ROWS):
+    from .criteria import get_criterion
+
+    entry = find_entry(filename, columns)
+    if entry is not None:
+        meta, _ = open_entry(entry)
+        data = encoding_dataset(meta['header'], meta['values'])
+        root_counts = None
+
+        def source():
+            return cache_chunks(entry, chunk_size)
+    else:
+        data, keep, root_counts = learn_and_count_root(filename, columns, chunk_size,
+                                                       target_attribute)
+        value_to_code = list(data['value_to_code'])
+
+        def source():
+            return csv_chunks(filename, keep, value_to_code, chunk_size)
+
+    luts = {}
+    if numeric:
+        idxs = [data['name_to_idx'][att] for att in numeric]
+        if root_counts is not None:
+            counts = {idx: root_counts[idx].sum(axis=1) for idx in idxs}
+        else:
+            counts = value_counts(source(), {idx: len(data['values'][idx]) for idx in idxs})
+        luts = bin_encoding(data, numeric, counts, max_bins)
+        if root_counts is not None:
+            for idx, lut in luts.items():
+                binned = np.zeros((len(data['values'][idx]), root_counts[idx].shape[1]),
+                                  dtype=np.int64)
+                np.add.at(binned, lut, root_counts[idx])
+                root_counts[idx] = binned
+
+    def chunks():
+        return binned_chunks(source(), luts) if luts else source()
+
+    header = data['header']
+    atts = [att for att in header if att != target_attribute]
+    uniqs = {att: data['values'][data['name_to_idx'][att]] for att in header}
+    ctx = new_context(data, uniqs, atts, target_attribute, get_criterion(criterion), node_info,
+                      min_samples_split, min_gain, depth=depth)
+    ctx.update(recorder=None, pool=None)
+
+    # node 0 collects rows that reached a leaf, node 1 is the root; 'slot' is
+    # the index of a frontier node in the counts of the next pass
+    route = {'feature': [-1, -1], 'offset': [0, 0], 'children': [], 'slot': [-1, 0]}
+    root = {}
+    frontier = [(root, 1, (1 << len(atts)) - 1, 0)]
+    if root_counts is not None:
+        hists = [np.concatenate([root_counts[idx] for idx in ctx['hist_idxs']] +
+                                [np.zeros((0, ctx['n_classes']), dtype=np.int64)])]
+        class_counts = [root_counts[ctx['target_idx']].sum(axis=0)]
+    else:
+        hists, class_counts = count_frontier(ctx, chunks(), route, 1)
+
+    while frontier:
+        next_frontier = []
+        for (node, node_id, mask, level), hist, counts in zip(frontier, hists, class_counts):
+            route['slot'][node_id] = -1
+            majority = majority_label(ctx, counts)
+            split = score_node(ctx, 0, int(counts.sum()), mask, level, hist, counts)
+            if split is None:
+                node['label'] = majority
+                continue
+
+            att, _, _, table, cut = split
+            fill_split(ctx, node, split)
+
+            att_idx = ctx['name_to_idx'][att]
+            n_values = len(ctx['values'][att_idx])
+            # the child each value code or bin goes to, by index in ``table``
+            child_of_code = np.arange(n_values) if cut is None else \
+                (np.arange(n_values) > cut).astype(np.int64)
+            sub_mask = mask if cut is not None else mask & ~(1 << ctx['hist_pos'][att])
+            sub_level = level + 1
+            base = route['offset'][node_id] = len(route['children'])
+            route['feature'][node_id] = att_idx
+            route['children'].extend([0] * n_values)
+
+            for att_value, child_idx in child_keys(ctx, split):
+                child_counts = table[child_idx]
+                n_rows = int(child_counts.sum())
+                if n_rows == 0:
+                    node['nodes'][att_value] = {'label': majority}
+                    continue
+                child = node['nodes'][att_value] = {}
+                if not can_split(ctx, n_rows, sub_mask, sub_level, child_counts):
+                    child['label'] = majority_label(ctx, child_counts)
+                    continue
+                child_id = len(route['feature'])
+                route['feature'].append(-1)
+                route['offset'].append(0)
+                route['slot'].append(len(next_frontier))
+                for code in np.flatnonzero(child_of_code == child_idx):
+                    route['children'][base + code] = child_id
+                next_frontier.append((child, child_id, sub_mask, sub_level))
+
+        frontier = next_frontier
+        if frontier:
+            hists, class_counts = count_frontier(ctx, chunks(), route, len(frontier))
+
+    return root, data
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+'''
+Process pool used by the tree builder.
+
+The encoded codes and the builder's row permutation are copied once into
+shared memory.  Workers attach to both in their initializer, so a task only
+carries ``(start, end)`` of a node's slice and whatever else is specific to
+it.  The pool runs two kinds of tasks:
+
+- counting the contingency tables of a block of candidate attributes for a
+  large node, which the builder then scores itself;
+- growing a whole subtree (see builder.py), which reorders only the
+  subtree's own slice of the shared permutation.
+'''
+
+import concurrent.futures
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .scoring import count_tables
+
+# nodes with fewer (row x candidate attribute) cells are scored locally
+PARALLEL_MIN_CELLS = 1 << 20
+
+# subtrees with fewer rows are grown locally
+SUBTREE_MIN_ROWS = 1 << 15
+
+_shared = {}
+
+
+def to_shared(array):
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    shared[...] = array
+    return shm, shared
+
+
+def attach_shared(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _init_worker(specs, context):
+    for key, (name, shape, dtype) in specs.items():
+        _shared[key] = attach_shared(name, shape, dtype)
+    _shared['context'] = context
+
+
+def worker_arrays():
+    return _shared['codes'][1], _shared['perm'][1], _shared['context']
+
+
+def _count_tables_task(start, end, att_idxs, sizes, target_idx, n_classes):
+    codes, perm, _ = worker_arrays()
+    return count_tables(codes, perm[start:end], att_idxs, sizes, target_idx, n_classes)
+
+
+class SharedPool(object):
+
+    def __init__(self, codes, perm, workers, context=None, min_cells=None, min_rows=None):
+        self.workers = workers
+        self.min_cells = PARALLEL_MIN_CELLS if min_cells is None else min_cells
+        self.min_rows = SUBTREE_MIN_ROWS if min_rows is None else min_rows
+        self._segments = []
+        specs = {}
+        for key, array in (('codes', codes), ('perm', perm)):
+            shm, shared = to_shared(array)
+            self._segments.append(shm)
+            specs[key] = (shm.name, array.shape, array.dtype.str)
+            setattr(self, key, shared)
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(specs, context))
+
+    def worth_it(self, n_rows, n_atts):
+        return n_atts > 1 and n_rows * n_atts >= self.min_cells
+
+    def worth_sending(self, n_rows):
+        return n_rows >= self.min_rows
+
+    def submit(self, fn, *args):
+        return self._executor.submit(fn, *args)
+
+    def count_tables(self, start, end, att_idxs, sizes, target_idx, n_classes):
+        n_chunks = min(self.workers, len(att_idxs))
+        bounds = np.linspace(0, len(att_idxs), n_chunks + 1).astype(int)
+        futures = [
+            self._executor.submit(_count_tables_task, start, end,
+                                  att_idxs[lo:hi], sizes[lo:hi], target_idx, n_classes)
+            for lo, hi in zip(bounds[:-1], bounds[1:])
+        ]
+        tables = []
+        for future in futures:
+            tables.extend(future.result())
+        return tables
+
+    def close(self):
+        # views on the segments must be gone before they can be closed
+        self.codes = self.perm = None
+        self._executor.shutdown()
+        for shm in self._segments:
+            shm.close()
+            shm.unlink()
+        self._segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
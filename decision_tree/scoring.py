@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+'''
+Contingency tables for split scoring.
+
+``count_hist`` counts (attribute value x class) for a set of rows and
+attributes with a single bincount, the tables of consecutive attributes
+stacked one after the other in one array: the histogram the builder keeps
+for every node (see builder.py).  ``count_tables`` returns the same counts
+as one table per attribute, for callers that need them apart
+(compute_stats, the counting tasks of parallel.py).  A criterion (see
+criteria.py) computes the impurity of each split from those counts, without
+building any partition.
+'''
+
+import numpy as np
+
+
+def count_hist(codes, rows, att_idxs, sizes, target_idx, n_classes):
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+
+    # one flat key per (attribute, value, class) cell, for every row at once;
+    # a single gather, so only the node's rows of each column are read
+    keys = codes[np.asarray(att_idxs, dtype=np.intp)[:, None], rows].astype(np.int64)
+    keys += offsets[:-1, None]
+    keys *= n_classes
+    keys += codes[target_idx][rows]
+
+    counts = np.bincount(keys.ravel(), minlength=offsets[-1] * n_classes)
+    return counts.reshape(-1, n_classes)
+
+
+def count_tables(codes, rows, att_idxs, sizes, target_idx, n_classes):
+    counts = count_hist(codes, rows, att_idxs, sizes, target_idx, n_classes)
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    return [counts[offsets[i]:offsets[i + 1]] for i in range(len(sizes))]
+
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+
+'''
+Local prediction service for a saved model.
+
+The server loads a model file (see model.py) once and answers
+
+    POST /predict   {"cap-shape": "x", ...}            -> {"label": "e"}
+                    [{...}, {...}] or {"records": [...]} -> {"labels": ["e", "p"]}
+    GET  /health                                       -> {"status": "ok", ...}
+
+on a TCP port or a Unix socket.  Request threads only encode their records;
+a single batching thread collects the rows of concurrent requests for at
+most ``max_delay`` seconds or ``max_batch`` rows and scores them with one
+``predict_batch`` call.  Attributes a record leaves out, and values the tree
+never saw, take the column's unseen code, the same as in evaluate.py.
+Numeric columns are binned with the tree's bin edges.
+'''
+
+import concurrent.futures
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from .compiled import predict_batch, decode_labels
+from .model import load_model
+from .numeric import to_numbers, bin_numbers
+
+MAX_BATCH = 256
+MAX_DELAY = 0.002
+
+
+def record_encoder(tree):
+    # value -> code tables of every column, built once per server
+    tables = [{v: i for i, v in enumerate(values)} for values in tree['values']]
+    unseen = [int(code) for code in tree['unseen']]
+    header = tree['header']
+    bins = tree['bins']
+
+    def encode_records(records):
+        X = np.empty((len(records), len(header)), dtype=np.int64)
+        for idx, att_name in enumerate(header):
+            table = tables[idx]
+            missing = unseen[idx]
+            if bins[idx] is not None:
+                numbers = to_numbers([record.get(att_name) for record in records])
+                X[:, idx] = bin_numbers(bins[idx], numbers)
+                continue
+            X[:, idx] = [table.get(_as_value(record.get(att_name)), missing)
+                         for record in records]
+        return X
+
+    return encode_records
+
+
+def _as_value(value):
+    # the value tables hold strings, as read from the CSV
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+class MicroBatcher(object):
+    '''Scores the encoded rows of concurrent callers in shared batches.'''
+
+    def __init__(self, tree, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.tree = tree
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.rows = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, X):
+        future = concurrent.futures.Future()
+        self._queue.put((X, future))
+        return future
+
+    def predict(self, X):
+        return self.submit(X).result()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        n_rows = len(first[0])
+        deadline = time.monotonic() + self.max_delay
+        while n_rows < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+            n_rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            try:
+                X = np.concatenate([X for X, _ in batch])
+                labels = decode_labels(self.tree, predict_batch(self.tree, X))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.rows += len(X)
+            start = 0
+            for X, future in batch:
+                future.set_result(labels[start:start + len(X)].tolist())
+                start += len(X)
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    # set on the server: encode_records, batcher, tree
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path != '/health':
+            self.send_json(404, {'error': 'not found'})
+            return
+        batcher = self.server.batcher
+        self.send_json(200, {'status': 'ok', 'target_attribute': self.server.tree['target_attribute'],
+                             'batches': batcher.batches, 'rows': batcher.rows})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self.send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length).decode('utf-8'))
+            single = isinstance(body, dict) and 'records' not in body
+            if single:
+                records = [body]
+            elif isinstance(body, dict):
+                records = body['records']
+            else:
+                records = body
+            if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+                raise ValueError('expected a record or a list of records')
+        except (ValueError, UnicodeDecodeError) as e:
+            self.send_json(400, {'error': str(e)})
+            return
+
+        labels = self.server.batcher.predict(self.server.encode_records(records)) if records else []
+        self.send_json(200, {'label': labels[0]} if single else {'labels': labels})
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class TCPHTTPServer(ThreadingHTTPServer):
+    # bursts of clients should queue, not be refused
+    request_queue_size = socket.SOMAXCONN
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = socket.SOMAXCONN
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def make_server(tree, host='127.0.0.1', port=8000, unix_socket=None,
+                max_batch=MAX_BATCH, max_delay=MAX_DELAY, verbose=False):
+    if unix_socket is not None:
+        server = UnixHTTPServer(unix_socket, PredictionHandler)
+    else:
+        server = TCPHTTPServer((host, port), PredictionHandler)
+    server.tree = tree
+    server.encode_records = record_encoder(tree)
+    server.batcher = MicroBatcher(tree, max_batch, max_delay)
+    server.verbose = verbose
+    return server
+
+
+def serve(model_file, host='127.0.0.1', port=8000, unix_socket=None,
+          max_batch=MAX_BATCH, max_delay=MAX_DELAY, verbose=False):
+    server = make_server(load_model(model_file), host, port, unix_socket,
+                         max_batch, max_delay, verbose)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.close()
+        if unix_socket is not None and os.path.exists(unix_socket):
+            os.unlink(unix_socket)
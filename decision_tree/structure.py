@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+'''
+Iterative traversals of the nested dict tree built by ``build_tree``.
+
+``tree_stats`` measures the tree in one pass over its nodes:
+
+{
+   'depth' : number of attribute tests on the longest root to leaf path,
+   'nodes' : number of nodes,
+   'leaves' : number of leaves,
+   'widths' : number of nodes at every depth, the root being depth 0
+}
+
+``iter_rules`` yields the rules one at a time, in depth first order, and
+``write_rules`` writes them to a file or anything with a ``write`` method,
+so neither keeps more than the current path in memory.  A threshold node of
+a numeric attribute gives the conditions ``att <= threshold`` and
+``att > threshold``.
+
+``write_tree`` writes the same text as ``repr(root)``, and ``flatten_tree``
+and ``unflatten_tree`` turn the tree into a flat list of nodes and back, for
+pickling; ``repr`` and ``pickle`` both recurse and fail on deep trees.
+'''
+
+
+def iter_nodes(root):
+    # (node, depth) pairs, depth first
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        yield node, depth
+        if 'label' not in node:
+            children = node.get('nodes', {})
+            stack.extend((children[key], depth + 1) for key in reversed(list(children)))
+
+
+def tree_stats(root):
+    widths = []
+    leaves = 0
+    for node, depth in iter_nodes(root):
+        if depth == len(widths):
+            widths.append(0)
+        widths[depth] += 1
+        if 'label' in node:
+            leaves += 1
+    return {
+        'depth': len(widths) - 1,
+        'nodes': sum(widths),
+        'leaves': leaves,
+        'widths': widths
+    }
+
+
+def iter_rules(root):
+    # each stack entry is the node and the iterator over its remaining
+    # branches, ``path`` holds the condition strings leading to the top one
+    path = []
+    if 'label' in root:
+        yield ' THEN ' + root['label']
+        return
+    stack = [(root, iter(root.get('nodes', {}).items()))]
+    while stack:
+        node, branches = stack[-1]
+        branch = next(branches, None)
+        if branch is None:
+            stack.pop()
+            if stack:
+                path.pop()
+            continue
+        value, child = branch
+        ifnd = 'IF ' if len(stack) == 1 else ' AND '
+        if 'threshold' in node:
+            condition = ifnd + node['attribute'] + ' ' + value + ' ' + repr(node['threshold'])
+        else:
+            condition = ifnd + node['attribute'] + ' EQUALS ' + value
+        if 'label' in child:
+            yield ''.join(path) + condition + ' THEN ' + child['label']
+        elif 'attribute' in child:
+            path.append(condition)
+            stack.append((child, iter(child.get('nodes', {}).items())))
+
+
+def write_rules(root, out, sep='\n'):
+    n_rules = 0
+    for rule in iter_rules(root):
+        out.write(rule)
+        out.write(sep)
+        n_rules += 1
+    return n_rules
+
+
+def iter_repr(root):
+    # the pieces of repr(root), from a stack of text and values still to expand
+    stack = [(False, root)]
+    while stack:
+        is_text, item = stack.pop()
+        if is_text:
+            yield item
+        elif isinstance(item, dict):
+            parts = [(True, '{')]
+            for i, (key, value) in enumerate(item.items()):
+                parts.append((True, (', ' if i else '') + repr(key) + ': '))
+                parts.append((False, value))
+            parts.append((True, '}'))
+            stack.extend(reversed(parts))
+        else:
+            yield repr(item)
+
+
+def write_tree(root, out):
+    for piece in iter_repr(root):
+        out.write(piece)
+
+
+def flatten_tree(root):
+    # (parent index, key in the parent's 'nodes', fields, is internal) per
+    # node, every parent before its children and siblings in key order
+    flat = []
+    stack = [(-1, None, root)]
+    while stack:
+        parent, key, node = stack.pop()
+        idx = len(flat)
+        flat.append((parent, key, {k: v for k, v in node.items() if k != 'nodes'},
+                     'nodes' in node))
+        if 'nodes' in node:
+            children = node['nodes']
+            stack.extend((idx, k, children[k]) for k in reversed(list(children)))
+    return flat
+
+
+def unflatten_tree(flat):
+    nodes = []
+    for parent, key, fields, internal in flat:
+        node = dict(fields)
+        if internal:
+            node['nodes'] = {}
+        if parent >= 0:
+            nodes[parent]['nodes'][key] = node
+        nodes.append(node)
+    return nodes[0]